@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+from datetime import date, datetime
+
+import numpy as np
+
+from employee_store import delta_paths
+
+# Layout: header | metadata (JSON) | digests uint64[n] (sorted)
+MAGIC = b"ANSINDEX"
+VERSION = 1
+HEADER = struct.Struct("<8sIQI")
+# Bump when normalize_answer changes so older indexes stop matching
+NORMALIZATION_VERSION = 1
+
+DATE_FIELDS = ("Date of Birth", "Date of Joining")
+PHONE_FIELDS = ("Phone Number",)
+# Subscriber number length; a country code or trunk prefix is dropped
+PHONE_DIGITS = 10
+# Numeric dates are year-first or day-first, so an ambiguous 01-02-2000
+# reads as dd-mm like the dataset; month names go through DATE_FORMATS
+_YEAR_FIRST = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})$")
+_DAY_FIRST = re.compile(r"(\d{1,2})-(\d{1,2})-(\d{4})$")
+DATE_FORMATS = ("%d-%b-%Y", "%d-%B-%Y", "%b-%d-%Y", "%B-%d-%Y")
+_DATE_SEPARATORS = re.compile(r"[\s/.,_-]+")
+_PHONE = re.compile(r"[+\d\s().-]+$")
+_NON_DIGITS = re.compile(r"\D")
+EMPTY_VALUES = (None, "", "NA")
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _parse_date(text):
+    try:
+        match = _YEAR_FIRST.match(text)
+        if match:
+            return date(int(match[1]), int(match[2]), int(match[3]))
+        match = _DAY_FIRST.match(text)
+        if match:
+            return date(int(match[3]), int(match[2]), int(match[1]))
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+    except ValueError:
+        pass
+    return None
+
+
+def normalize_answer(field, value):
+    """
+    Canonical form of an answer, so "2017-11-29", "29/11/2017" and
+    "29 Nov 2017" all match a stored "29-11-2017", and "+91 98765 43210"
+    matches "9876543210". Everything else is compared casefolded with
+    whitespace collapsed.
+    """
+    value = str(value).strip()
+    if field in DATE_FIELDS:
+        parsed = _parse_date(_DATE_SEPARATORS.sub("-", value))
+        if parsed is not None:
+            return parsed.isoformat()
+    elif field in PHONE_FIELDS and _PHONE.match(value):
+        digits = _NON_DIGITS.sub("", value)
+        if digits:
+            return digits[-PHONE_DIGITS:]
+    return " ".join(value.casefold().split())
+
+
+def source_signature(path):
+    """What the index was built from; a rebuilt or updated dataset no longer matches."""
+    stat = os.stat(path)
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    deltas = delta_paths(path)
+    if deltas:
+        signature["deltas"] = [[os.path.basename(p), os.stat(p).st_size] for p in deltas]
+    return signature
+
+
+def _digest(salt, user_id, field, normalized):
+    data = f"{str(user_id).strip()}\x1f{field}\x1f{normalized}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8, key=salt).digest(), "little")
+
+
+def _record_digests(salt, records, fields):
+    """Sorted unique digests of every answer in `records`; adds the fields seen to `fields`."""
+    digests = []
+    for record in records:
+        user_id = record.get("Employee ID")
+        if user_id in EMPTY_VALUES:
+            continue
+        for field, value in record.items():
+            if field == "Employee ID":
+                continue
+            for answer in value if isinstance(value, list) else [value]:
+                if answer in EMPTY_VALUES:
+                    continue
+                fields.add(field)
+                digests.append(_digest(salt, user_id, field, normalize_answer(field, answer)))
+    return np.unique(np.array(digests, dtype="<u8"))
+
+
+def _write_index(index_path, meta, digests):
+    meta = json.dumps(meta).encode("utf-8")
+    directory = os.path.dirname(os.path.abspath(index_path))
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as out:
+        out.write(HEADER.pack(MAGIC, VERSION, len(digests), len(meta)))
+        out.write(meta.ljust(_align(HEADER.size + len(meta)) - HEADER.size, b" "))
+        out.write(digests.tobytes())
+    os.replace(out.name, index_path)
+
+
+def build_answer_index(dataset, index_path="answer_index.bin"):
+    """
+    Hash every (employee, field, normalized answer) of `dataset` into a
+    sorted array of 64-bit keyed digests. Answers themselves are not stored.
+    """
+    salt = os.urandom(16)
+    fields = set()
+    digests = _record_digests(salt, dataset, fields)
+    _write_index(index_path, {
+        "normalization": NORMALIZATION_VERSION,
+        "salt": salt.hex(),
+        "fields": sorted(fields),
+        "source": source_signature(dataset.path) if os.path.exists(str(dataset.path)) else None,
+    }, digests)
+    return len(digests)
+
+
+def update_answer_index(index_path, source_path, removed=(), added=()):
+    """
+    Apply a dataset update without rehashing everything: drop the digests
+    of the `removed` records (old versions of changed or deleted employees),
+    add those of `added`, and re-sign the index for `source_path`.
+    """
+    index = AnswerIndex(index_path)
+    try:
+        meta, salt, digests = dict(index.meta), index._salt, np.array(index._digests)
+    finally:
+        index.close()
+    fields = set(meta["fields"])
+    digests = np.setdiff1d(digests, _record_digests(salt, removed, set()), assume_unique=True)
+    digests = np.union1d(digests, _record_digests(salt, added, fields))
+    meta["fields"] = sorted(fields)
+    meta["source"] = source_signature(source_path)
+    _write_index(index_path, meta, digests)
+    return len(digests)
+
+
+class AnswerIndex:
+    """
+    Memory-mapped set of answer digests. A check is one normalization, one
+    keyed blake2b and a binary search; no correct answers are held in memory.
+
+    The salt lives in the file, so the index keeps answers out of process
+    memory and logs but is not a secret: anyone with the file can still
+    test guesses for low-entropy fields such as dates.
+    """
+
+    def __init__(self, path="answer_index.bin"):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n, meta_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} answer index")
+        self.meta = json.loads(self._mm[HEADER.size:HEADER.size + meta_len])
+        if self.meta.get("normalization") != NORMALIZATION_VERSION:
+            raise ValueError(f"{path} was built with answer normalization v{self.meta.get('normalization')}")
+        self._salt = bytes.fromhex(self.meta["salt"])
+        self._digests = np.frombuffer(self._mm, dtype="<u8", count=n, offset=_align(HEADER.size + meta_len))
+
+    def __len__(self):
+        return len(self._digests)
+
+    def matches_source(self, path):
+        return self.meta.get("source") is not None and self.meta["source"] == source_signature(path)
+
+    def matches(self, user_id, field, answer):
+        # As np.uint64: a Python int above 2**63 would make numpy convert the whole array
+        key = np.uint64(_digest(self._salt, user_id, field, normalize_answer(field, answer)))
+        pos = int(np.searchsorted(self._digests, key))
+        return pos < len(self._digests) and bool(self._digests[pos] == key)
+
+    def close(self):
+        self._digests = None
+        self._mm.close()
+        self._file.close()
+
+
+if __name__ == "__main__":
+    from employee_dataset import EmployeeDataset
+
+    parser = argparse.ArgumentParser(description="Build the hashed index of normalized answers.")
+    parser.add_argument("--data", default="employee_store.bin", help="employee store or JSON dataset")
+    parser.add_argument("--output", default="answer_index.bin")
+    args = parser.parse_args()
+
+    count = build_answer_index(EmployeeDataset(args.data, answer_index_path=None), args.output)
+    print(f"✅ Indexed {count} answers from {args.data} in {args.output}")
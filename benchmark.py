@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from intial_50000_data import NameEngine, allocate_employee_ids
+from enrich_employee_data import enrich_columnar
+from employee_store import build_employee_store
+from answer_index import build_answer_index
+from employee_dataset import EmployeeDataset
+from interaction_log import InteractionLog
+from template_catalog import TemplateCatalog
+from log_simulator import LogSimulator, dataset_user_ids
+from ml_selector import FieldTemplateSelector
+from question_asker import QuestionAsker
+from verification_service import VerificationService
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class LatencyRecorder:
+    """Collects per-stage latencies in seconds."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, stage, fn):
+        samples = self.samples[stage]
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+        return timed
+
+    def summary(self, wall_seconds):
+        report = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            ms = np.array(samples) * 1000
+            report[stage] = {
+                "count": len(samples),
+                "throughput_per_s": round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+                "mean_ms": round(float(ms.mean()), 4),
+                "p50_ms": round(float(np.percentile(ms, 50)), 4),
+                "p95_ms": round(float(np.percentile(ms, 95)), 4),
+                "p99_ms": round(float(np.percentile(ms, 99)), 4),
+                "max_ms": round(float(ms.max()), 4),
+            }
+        return report
+
+
+def synthetic_store(employees, seed, cache_dir):
+    """Build (or reuse) an employee store with `employees` synthetic rows."""
+    os.makedirs(cache_dir, exist_ok=True)
+    store_path = os.path.join(cache_dir, f"employees-{employees}-{seed}.bin")
+    if os.path.exists(store_path):
+        return store_path
+
+    rng = np.random.default_rng(seed)
+    # Widen the ID space until it is at least twice the population
+    width = 6
+    while 9 * 10 ** (width - 1) < 2 * employees:
+        width += 1
+    df = pd.DataFrame({
+        "Employee Name": NameEngine().generate(employees, seed=rng),
+        "Employee ID": allocate_employee_ids(employees, width=width, seed=rng),
+    })
+    csv_path = store_path[:-4] + ".csv"
+    enrich_columnar(df, seed=rng).to_csv(csv_path, index=False)
+    del df
+    build_employee_store(csv_path, store_path)
+    os.remove(csv_path)
+    return store_path
+
+
+class ServiceThread:
+    """The service's HTTP server on a free local port, run by an event loop on its own thread."""
+
+    def __init__(self, service, host="127.0.0.1"):
+        self.host = host
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(service.handle_connection, host, 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever, name="bench-server", daemon=True)
+        self.thread.start()
+
+    async def _shutdown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        # Connection handlers end once their clients hang up
+        handlers = asyncio.all_tasks() - {asyncio.current_task()}
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def simulate_users(host, port, dataset, users, concurrency, correct_rate, seed, recorder):
+    """
+    Run `users` verification sessions against the HTTP service over
+    `concurrency` keep-alive client connections at once. Correct answers
+    come from the dataset, as a real employee would know them.
+    """
+    rng = random.Random(seed)
+    ids = dataset.store.ids()
+    # Drawn up front so the workload doesn't depend on thread scheduling
+    plans = [(str(ids[rng.randrange(len(ids))]), random.Random(rng.random())) for _ in range(users)]
+    local = threading.local()
+    conns = []
+
+    def request(method, path, body=None):
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection(host, port)
+            conns.append(local.conn)
+        start = time.perf_counter()
+        local.conn.request(method, path, body=json.dumps(body) if body is not None else None,
+                           headers={"Content-Type": "application/json"})
+        response = local.conn.getresponse()
+        payload = json.loads(response.read())
+        recorder.samples["http_request"].append(time.perf_counter() - start)
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path} failed with {response.status}: {payload.get('error')}")
+        return payload
+
+    def one_user(plan):
+        employee_id, user_rng = plan
+        start = time.perf_counter()
+        record = dataset.get(employee_id)
+        session_id = request("POST", "/sessions", {"employee_id": employee_id})["session_id"]
+        for q in request("GET", f"/sessions/{session_id}/questions")["questions"]:
+            answer = record.get(q["field"], "")
+            if isinstance(answer, list):
+                answer = answer[0] if answer else ""
+            if user_rng.random() >= correct_rate:
+                answer = "wrong answer"
+            request("POST", f"/sessions/{session_id}/answers", {"question_id": q["question_id"], "answer": answer})
+        recorder.samples["session"].append(time.perf_counter() - start)
+
+    try:
+        with ThreadPoolExecutor(concurrency, thread_name_prefix="bench-client") as pool:
+            # list() re-raises the first failed session
+            list(pool.map(one_user, plans))
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=HERE, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(employees=50000, history=5000, users=500, concurrency=32, correct_rate=0.8,
+                  seed=0, cache_dir=os.path.join(HERE, ".bench_cache")):
+    timings = {}
+    start = time.perf_counter()
+    store_path = synthetic_store(employees, seed, cache_dir)
+    timings["dataset_build_s"] = round(time.perf_counter() - start, 3)
+
+    with tempfile.TemporaryDirectory() as work:
+        answer_index_path = os.path.join(work, "answer_index.bin")
+        start = time.perf_counter()
+        build_answer_index(EmployeeDataset(store_path, answer_index_path=None), answer_index_path)
+        timings["answer_index_build_s"] = round(time.perf_counter() - start, 3)
+        dataset = EmployeeDataset(store_path, answer_index_path=answer_index_path)
+        template_bank_path = os.path.join(HERE, "template_bank.json")
+        catalog_path = os.path.join(work, "template_catalog.json")
+        catalog = TemplateCatalog.build(template_bank_path, catalog_path)
+
+        log_store = InteractionLog(os.path.join(work, "logs"))
+        LogSimulator(dataset_user_ids(dataset), catalog, seed=seed).write(log_store, history)
+
+        start = time.perf_counter()
+        selector = FieldTemplateSelector(
+            dataset, log_store=log_store, legacy_logs_path=os.path.join(work, "logs.json"),
+            checkpoint_dir=os.path.join(work, "checkpoints"),
+            template_bank_path=template_bank_path, seed_log_count=0, catalog_path=catalog_path,
+            model_dir=os.path.join(work, "models"),
+        )
+        timings["selector_startup_s"] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        selector.train_supervised()
+        timings["initial_training_s"] = round(time.perf_counter() - start, 3)
+        asker = QuestionAsker(selector, dataset, history_path=os.path.join(work, "question_history.db"),
+                              legacy_history_path=None)
+
+        # Time each stage by wrapping the instance methods in place
+        recorder = LatencyRecorder()
+        asker.ask_questions = recorder.wrap("question_selection", asker.ask_questions)
+        asker.record_user_answer = recorder.wrap("answer_recording", asker.record_user_answer)
+        log_store.append = recorder.wrap("log_persistence", log_store.append)
+        selector.fit_field_model = recorder.wrap("retraining", selector.fit_field_model)
+
+        service = VerificationService(selector, asker, dataset)
+        server = ServiceThread(service)
+        start = time.perf_counter()
+        try:
+            simulate_users(server.host, server.port, dataset, users, concurrency, correct_rate, seed, recorder)
+        finally:
+            wall = time.perf_counter() - start
+            server.close()
+            service.close()
+
+        selector.trainer.stop()
+        log_store.close()
+        asker.close()
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {"employees": employees, "history": history, "users": users,
+                   "concurrency": concurrency, "correct_rate": correct_rate, "seed": seed},
+        "setup": timings,
+        "wall_seconds": round(wall, 3),
+        "sessions_per_s": round(users / wall, 2) if wall else None,
+        "stages": recorder.summary(wall),
+        "trainer": selector.trainer.metrics(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local load test of the ask/answer path over HTTP.")
+    parser.add_argument("--employees", type=int, default=50000)
+    parser.add_argument("--history", type=int, default=5000, help="log entries to preload")
+    parser.add_argument("--users", type=int, default=500, help="simulated verification sessions")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent client connections")
+    parser.add_argument("--correct-rate", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="results file (default bench_results/<time>.json)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.employees, args.history, args.users, args.concurrency,
+                            args.correct_rate, args.seed)
+    output = args.output or os.path.join(
+        HERE, "bench_results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for stage, stats in results["stages"].items():
+        print(f"{stage:20s} n={stats['count']:<7d} p50={stats['p50_ms']:.2f}ms "
+              f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+    print(f"✅ {results['sessions_per_s']} sessions/s, results saved to {output}")
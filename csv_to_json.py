@@ -1,3 +1,5 @@
+import argparse
+import gzip
 import pandas as pd
 import json
 
@@ -24,7 +26,49 @@ def csv_to_json(input_csv, output_json):
     
     print(f"✅ Converted {len(records)} records to {output_json} with missing values as 'NA'.")
 
+def clean_chunk(df):
+    """Column-wise version of clean_record for a chunk read with dtype=str."""
+    df = df.apply(lambda col: col.str.strip())
+    return df.mask(df == "", "NA")
+
+def csv_to_ndjson(input_csv, output_path, chunksize=100_000, compress=None):
+    """
+    Stream the CSV into compact JSON Lines (one record per line), one chunk at
+    a time, so memory stays flat regardless of the number of rows.
+    `compress="gzip"` (or an output path ending in .gz) gzips the output.
+    """
+    if compress is None and output_path.endswith(".gz"):
+        compress = "gzip"
+    opener = gzip.open if compress == "gzip" else open
+
+    total = 0
+    reader = pd.read_csv(
+        input_csv,
+        dtype=str,
+        keep_default_na=False,  # Prevents pandas from auto-setting NaN
+        chunksize=chunksize,
+    )
+    with opener(output_path, "wt", encoding="utf-8") as f:
+        for chunk in reader:
+            lines = clean_chunk(chunk).to_json(orient="records", lines=True)
+            # Older pandas versions leave off the trailing newline
+            f.write(lines if lines.endswith("\n") else lines + "\n")
+            total += len(chunk)
+
+    print(f"✅ Streamed {total} records to {output_path} with missing values as 'NA'.")
+    return total
+
 if __name__ == "__main__":
-    input_csv = "/Users/jaiharishsatheshkumar/synthetic_data_generator/enriched_employee_dataset_50000.csv"
-    output_json = "enriched_employee_dataset_50000.json"
-    csv_to_json(input_csv, output_json)
+    parser = argparse.ArgumentParser(description="Convert the enriched employee CSV to JSON.")
+    parser.add_argument("--input", default="/Users/jaiharishsatheshkumar/synthetic_data_generator/enriched_employee_dataset_50000.csv")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--ndjson", action="store_true", help="stream compact JSON Lines instead of one JSON array")
+    parser.add_argument("--gzip", action="store_true", help="gzip the --ndjson output")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.ndjson:
+        output = args.output or "enriched_employee_dataset_50000.ndjson" + (".gz" if args.gzip else "")
+        csv_to_ndjson(args.input, output, args.chunksize, "gzip" if args.gzip else None)
+    else:
+        csv_to_json(args.input, args.output or "enriched_employee_dataset_50000.json")
@@ -0,0 +1,102 @@
+import json
+import os
+from functools import cached_property
+
+from metrics import REGISTRY
+
+DEFAULT_DATA_PATH = "/Users/jaiharishsatheshkumar/synthetic_data_generator/enriched_employee_dataset_50000.json"
+
+
+class EmployeeDataset:
+    """
+    The enriched employee data, loaded once and shared by main.py,
+    FieldTemplateSelector and QuestionAsker.
+
+    `path` may be the JSON dataset or an employee store (.bin) built by
+    employee_store.py. Lookups, the valid-user set and the answer index are
+    all built lazily on first use. Answers are checked against the hashed
+    index from answer_index.py when one was built for this dataset.
+    """
+
+    def __init__(self, path=DEFAULT_DATA_PATH, records=None, answer_index_path="answer_index.bin"):
+        self.path = path
+        self.store = None
+        self._records = records
+        self.answer_index_path = answer_index_path
+        if records is None and str(path).endswith(".bin"):
+            # Imported here so the JSON path doesn't pull in numpy
+            from employee_store import EmployeeStore
+            self.store = EmployeeStore(path)
+
+    @property
+    def records(self):
+        if self.store is not None:
+            return list(self.store)
+        if self._records is None:
+            try:
+                with REGISTRY.timer("dataset_load"), open(self.path) as f:
+                    self._records = json.load(f)
+            except Exception as e:
+                print(f"Warning: Could not load employee data from {self.path}: {e}")
+                self._records = []
+        return self._records
+
+    def __iter__(self):
+        return iter(self.store if self.store is not None else self.records)
+
+    @cached_property
+    def _index(self):
+        return {str(r['Employee ID']): r for r in self.records if 'Employee ID' in r}
+
+    @cached_property
+    def valid_users(self):
+        if self.store is not None:
+            return {str(i) for i in self.store.ids()}
+        return set(self._index)
+
+    def get(self, user_id):
+        """Raw record for `user_id`, or None."""
+        if self.store is not None:
+            return self.store.get(user_id)
+        return self._index.get(str(user_id))
+
+    def is_valid_user(self, user_id):
+        if self.store is not None:
+            return str(user_id) in self.store
+        return str(user_id) in self._index
+
+    @cached_property
+    def answer_index(self):
+        """The AnswerIndex built from this dataset, or None if there is none or it is stale."""
+        if self.answer_index_path is None or self._records is not None or not os.path.exists(self.answer_index_path):
+            return None
+        from answer_index import AnswerIndex
+        try:
+            index = AnswerIndex(self.answer_index_path)
+        except Exception as e:
+            print(f"Warning: Could not open answer index {self.answer_index_path}: {e}")
+            return None
+        if not index.matches_source(self.path):
+            print(f"Warning: {self.answer_index_path} was built from a different {self.path}; "
+                  f"rebuild it with `python answer_index.py`")
+            index.close()
+            return None
+        return index
+
+    def answer_matches(self, user_id, field, answer, correct_answers=None):
+        """
+        Whether `answer` is accepted for `field`, compared in normalized form
+        (dates, phone digits, case, whitespace). Uses the answer index when
+        available, else `correct_answers` (default: the user's record).
+        """
+        index = self.answer_index
+        if index is not None:
+            return index.matches(user_id, field, answer)
+
+        from answer_index import EMPTY_VALUES, normalize_answer
+        if correct_answers is None:
+            correct_answers = (self.get(user_id) or {}).get(field)
+        if not isinstance(correct_answers, list):
+            correct_answers = [correct_answers]
+        normalized = normalize_answer(field, answer)
+        return any(normalize_answer(field, a) == normalized for a in correct_answers if a not in EMPTY_VALUES)
@@ -0,0 +1,311 @@
+import argparse
+import gzip
+import itertools
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+
+import numpy as np
+
+# Layout: header | field names (JSON) | ids int64[n] (sorted) |
+#         starts uint64[n] | lengths uint32[n] | record blob
+# Each record is its values in field order, utf-8, joined by SEP. Delta
+# segments (<store>.delta/delta-NNNNNN.bin) share the layout; an empty
+# record there marks a deleted ID.
+MAGIC = b"EMPSTORE"
+VERSION = 1
+HEADER = struct.Struct("<8sIQI")
+SEP = "\x1f"
+DELTA_PATTERN = re.compile(r"delta-(\d+)\.bin$")
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _employee_key(employee_id):
+    employee_id = str(employee_id).strip()
+    if not employee_id.isdigit() or len(employee_id) > 18:
+        raise ValueError(f"Employee ID {employee_id!r} is not a numeric ID")
+    return int(employee_id)
+
+
+def _iter_source(source, chunksize):
+    """Yield lists of cleaned records from a CSV, JSON array or NDJSON file."""
+    # Only needed to build a store, not to read one
+    import pandas as pd
+    from csv_to_json import clean_chunk, clean_record
+
+    if source.endswith(".csv"):
+        for chunk in pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunksize):
+            yield clean_chunk(chunk).to_dict(orient="records")
+    elif source.endswith((".ndjson", ".jsonl", ".ndjson.gz", ".jsonl.gz")):
+        opener = gzip.open if source.endswith(".gz") else open
+        with opener(source, "rt", encoding="utf-8") as f:
+            batch = []
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= chunksize:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+    else:
+        with open(source) as f:
+            yield [clean_record(r) for r in json.load(f)]
+
+
+def _encode(record, fields):
+    return SEP.join(str(record.get(f, "NA")) for f in fields).encode("utf-8")
+
+
+def _write_store(store_path, fields, entries, source):
+    """
+    Write `(key, data)` pairs as a store file. Entries are streamed into the
+    blob; only the id/offset arrays are kept in memory. Empty data marks a
+    deleted ID and only appears in delta segments.
+    """
+    ids, starts, lengths = [], [], []
+    blob_size = 0
+
+    with tempfile.TemporaryFile() as blob:
+        for key, data in entries:
+            ids.append(key)
+            starts.append(blob_size)
+            lengths.append(len(data))
+            blob.write(data)
+            blob_size += len(data)
+
+        ids = np.array(ids, dtype="<i8")
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+        if len(ids) > 1 and (ids[1:] == ids[:-1]).any():
+            dup = ids[1:][ids[1:] == ids[:-1]][0]
+            raise ValueError(f"Duplicate Employee ID {dup} in {source}")
+        starts = np.array(starts, dtype="<u8")[order]
+        lengths = np.array(lengths, dtype="<u4")[order]
+
+        meta = json.dumps(list(fields)).encode("utf-8")
+        directory = os.path.dirname(os.path.abspath(store_path))
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as out:
+            out.write(HEADER.pack(MAGIC, VERSION, len(ids), len(meta)))
+            out.write(meta.ljust(_align(HEADER.size + len(meta)) - HEADER.size, b" "))
+            out.write(ids.tobytes())
+            out.write(starts.tobytes())
+            out.write(lengths.tobytes())
+            blob.seek(0)
+            while True:
+                block = blob.read(1 << 20)
+                if not block:
+                    break
+                out.write(block)
+        os.replace(out.name, store_path)
+    return len(ids)
+
+
+def delta_dir(store_path):
+    return store_path + ".delta"
+
+
+def delta_paths(store_path):
+    """Delta segments of a store, oldest first."""
+    directory = delta_dir(store_path)
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if DELTA_PATTERN.match(name)]
+
+
+def _clear_deltas(store_path, paths=None):
+    for path in delta_paths(store_path) if paths is None else paths:
+        os.remove(path)
+
+
+def build_employee_store(source, store_path="employee_store.bin", chunksize=100_000):
+    """
+    Build a store from the enriched CSV/JSON/NDJSON dataset. Any delta
+    segments of a previous store at `store_path` are dropped.
+    """
+    chunks = _iter_source(source, chunksize)
+    first = next(chunks, [])
+    fields = list(first[0]) if first else []
+
+    def entries():
+        for records in itertools.chain([first], chunks):
+            for record in records:
+                yield _employee_key(record["Employee ID"]), _encode(record, fields)
+
+    count = _write_store(store_path, fields, entries(), source)
+    _clear_deltas(store_path)
+    print(f"✅ Stored {count} employees in {store_path}")
+    return count
+
+
+def write_delta(store_path, upserts=(), deletes=()):
+    """
+    Write a delta segment for the store at `store_path`: `upserts` are full
+    records that replace or add employees, `deletes` are IDs of leavers.
+    Returns the segment path; readers see it the next time they open the store.
+    """
+    with EmployeeStore(store_path) as store:
+        fields = list(store.fields)
+    for record in upserts:
+        fields += [f for f in record if f not in fields]
+
+    existing = delta_paths(store_path)
+    sequence = int(DELTA_PATTERN.match(os.path.basename(existing[-1])).group(1)) + 1 if existing else 1
+    os.makedirs(delta_dir(store_path), exist_ok=True)
+    path = os.path.join(delta_dir(store_path), f"delta-{sequence:06d}.bin")
+    entries = [(_employee_key(r["Employee ID"]), _encode(r, fields)) for r in upserts]
+    entries += [(_employee_key(employee_id), b"") for employee_id in deletes]
+    _write_store(path, fields, entries, path)
+    return path
+
+
+def compact_employee_store(store_path="employee_store.bin"):
+    """Merge all delta segments into a new base file. Returns the number of segments merged."""
+    with EmployeeStore(store_path) as store:
+        merged = [segment.path for segment in store.deltas]
+        if not merged:
+            return 0
+        fields = list(store.fields)
+        entries = ((int(key), _encode(store.get(key), fields)) for key in store.ids())
+        _write_store(store_path, fields, entries, store_path)
+    _clear_deltas(store_path, merged)
+    return len(merged)
+
+
+class _Segment:
+    """One memory-mapped store file: the base or a delta segment."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n, meta_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} employee store")
+        self.fields = json.loads(self._mm[HEADER.size:HEADER.size + meta_len])
+
+        offset = _align(HEADER.size + meta_len)
+        self.ids = np.frombuffer(self._mm, dtype="<i8", count=n, offset=offset)
+        offset += 8 * n
+        self.starts = np.frombuffer(self._mm, dtype="<u8", count=n, offset=offset)
+        offset += 8 * n
+        self.lengths = np.frombuffer(self._mm, dtype="<u4", count=n, offset=offset)
+        self._blob_offset = offset + 4 * n
+
+    def position(self, key):
+        pos = int(np.searchsorted(self.ids, key))
+        if pos < len(self.ids) and self.ids[pos] == key:
+            return pos
+        return None
+
+    def record_at(self, pos):
+        """The record at `pos`, or None for a deleted ID."""
+        length = int(self.lengths[pos])
+        if not length:
+            return None
+        start = self._blob_offset + int(self.starts[pos])
+        values = self._mm[start:start + length].decode("utf-8").split(SEP)
+        return dict(zip(self.fields, values))
+
+    def close(self):
+        # Drop the numpy views first, mmap refuses to close while exported
+        self.ids = self.starts = self.lengths = None
+        self._mm.close()
+        self._file.close()
+
+
+class EmployeeStore:
+    """
+    Read-only, memory-mapped employee store. Opening it only maps the file;
+    `get` binary-searches the sorted ID index and decodes a single record.
+
+    Incremental updates (see incremental_update.py) are delta segments in
+    `<path>.delta/`, in the same format. Lookups check them newest first;
+    an empty record in a delta marks a deleted employee. Records written
+    before a delta added a field report it as "NA".
+    """
+
+    def __init__(self, path="employee_store.bin"):
+        self.path = path
+        self.base = _Segment(path)
+        self.deltas = [_Segment(p) for p in delta_paths(path)]
+        self.fields = list(self.base.fields)
+        for segment in self.deltas:
+            self.fields += [f for f in segment.fields if f not in self.fields]
+        self._merged_ids = None
+
+    def __len__(self):
+        return len(self.ids())
+
+    def __contains__(self, employee_id):
+        return self.get(employee_id) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, employee_id):
+        """Record for `employee_id` as a dict of strings, or None."""
+        try:
+            key = _employee_key(employee_id)
+        except ValueError:
+            return None
+        for segment in reversed(self.deltas):
+            pos = segment.position(key)
+            if pos is not None:
+                return self._complete(segment.record_at(pos))
+        pos = self.base.position(key)
+        return None if pos is None else self._complete(self.base.record_at(pos))
+
+    def _complete(self, record):
+        if record is None or len(record) == len(self.fields):
+            return record
+        return {f: record.get(f, "NA") for f in self.fields}
+
+    def ids(self):
+        """
+        Sorted employee IDs as an int64 array: a view into the map without
+        deltas, otherwise merged once on first use.
+        """
+        if not self.deltas:
+            return self.base.ids
+        if self._merged_ids is None:
+            ids = self.base.ids
+            for segment in self.deltas:
+                deleted = segment.lengths == 0
+                ids = np.setdiff1d(ids, segment.ids[deleted], assume_unique=True)
+                ids = np.union1d(ids, segment.ids[~deleted])
+            self._merged_ids = ids
+        return self._merged_ids
+
+    def __iter__(self):
+        if not self.deltas:
+            for pos in range(len(self.base.ids)):
+                yield self.base.record_at(pos)
+            return
+        for key in self.ids():
+            yield self.get(int(key))
+
+    def close(self):
+        self._merged_ids = None
+        for segment in [self.base] + self.deltas:
+            segment.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the memory-mapped employee store.")
+    parser.add_argument("--source", default="enriched_employee_dataset_50000.json",
+                        help="enriched dataset as .csv, .json or .ndjson[.gz]")
+    parser.add_argument("--output", default="employee_store.bin")
+    args = parser.parse_args()
+    build_employee_store(args.source, args.output)
@@ -1,11 +1,10 @@
+import argparse
 import pandas as pd
+import numpy as np
 import random
 from faker import Faker
-from datetime import datetime
-
-# Load the original CSV with 50,000 employees
-input_csv = "/Users/jaiharishsatheshkumar/synthetic_data_generator/50000_employees.csv"
-df = pd.read_csv(input_csv)
+from faker.providers.person.en_IN import Provider
+from datetime import datetime, date, timedelta
 
 # Initialize Faker for Indian locale
 fake = Faker('en_IN')
@@ -71,34 +70,110 @@ field_generators = {
     'Designation': random_designation
 }
 
-# Process all records
-output_data = []
-
-for index, row in df.iterrows():
-    emp_id = row['Employee ID']
-    emp_name = row['Employee Name']
-    
-    # Pick 6 out of 9 fields randomly
-    selected_fields = random.sample(list(field_generators.keys()), 6)
+FIELDS_PER_EMPLOYEE = 6
+
+
+def enrich_rows(df):
+    """Original row-by-row enrichment (one Python call per field)."""
+    output_data = []
+
+    for index, row in df.iterrows():
+        emp_id = row['Employee ID']
+        emp_name = row['Employee Name']
+
+        # Pick 6 out of 9 fields randomly
+        selected_fields = random.sample(list(field_generators.keys()), FIELDS_PER_EMPLOYEE)
+
+        # Basic record
+        record = {
+            'Employee Name': emp_name,
+            'Employee ID': emp_id
+        }
+
+        # Add randomly selected fields
+        for field in selected_fields:
+            if field == 'Email':
+                record[field] = random_email(emp_id)
+            else:
+                record[field] = field_generators[field]()
+
+        output_data.append(record)
+
+    return pd.DataFrame(output_data)
+
+
+def _date_labels(start, end):
+    """All dates in [start, end] formatted once, so offsets can index into them."""
+    return pd.date_range(start, end, freq="D").strftime("%d-%m-%Y").to_numpy(dtype=object)
+
+
+def enrich_columnar(df, seed=None):
+    """
+    Columnar version of enrich_rows: the 6-of-9 field mask is drawn for all
+    rows at once and every column is filled with NumPy. Fields that were not
+    selected for a row are left empty, exactly like the row-wise output.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    n = len(df)
+    fields = list(field_generators)
+
+    # Rank random keys per row; the 6 lowest ranks are the selected fields
+    order = rng.random((n, len(fields))).argsort(axis=1)
+    mask = np.zeros((n, len(fields)), dtype=bool)
+    np.put_along_axis(mask, order[:, :FIELDS_PER_EMPLOYEE], True, axis=1)
+
+    emp_ids = df['Employee ID'].astype(str).to_numpy(dtype=object)
+    today = date.today()
+    dob_labels = _date_labels(pd.Timestamp(today) - pd.DateOffset(years=56) + timedelta(days=1), today)
+    doj_labels = _date_labels(date(2000, 1, 1), today)
+    first_names = np.array(Provider.first_names, dtype=object)
+    last_names = np.array(Provider.last_names, dtype=object)
+
+    def pick(values):
+        values = np.asarray(values, dtype=object)
+        return values[rng.integers(0, len(values), size=n)]
+
+    phone_rest = np.char.zfill(rng.integers(0, 10 ** 9, size=n).astype("U9"), 9)
+    laptop_ltp = np.char.add("LTP-", rng.integers(1000, 10000, size=n).astype("U4"))
+    laptop_lt = np.char.add("LT-200", rng.integers(10, 100, size=n).astype("U2"))
+
+    columns = {
+        'Phone Number': "+91 " + pick(['6', '8', '9']) + phone_rest.astype(object),
+        'Email': emp_ids + "@hexaware.com",
+        'Location': pick(locations),
+        'Project Name': pick(project_names),
+        'Laptop ID': np.where(rng.random(n) < 0.5, laptop_ltp, laptop_lt).astype(object),
+        'Date of Birth': pick(dob_labels),
+        'Date of Joining': pick(doj_labels),
+        'Manager Name': pick(first_names) + " " + pick(last_names),
+        'Designation': pick(designations),
+    }
 
-    # Basic record
-    record = {
-        'Employee Name': emp_name,
-        'Employee ID': emp_id
+    output = {
+        'Employee Name': df['Employee Name'].to_numpy(),
+        'Employee ID': df['Employee ID'].to_numpy(),
     }
+    for i, field in enumerate(fields):
+        values = columns[field]
+        values[~mask[:, i]] = None
+        output[field] = values
+
+    return pd.DataFrame(output)
+
 
-    # Add randomly selected fields
-    for field in selected_fields:
-        if field == 'Email':
-            record[field] = random_email(emp_id)
-        else:
-            record[field] = field_generators[field]()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrich the employee list with random profile fields.")
+    parser.add_argument("--input", default="/Users/jaiharishsatheshkumar/synthetic_data_generator/50000_employees.csv")
+    parser.add_argument("--output", default="enriched_employee_dataset_50000.csv")
+    parser.add_argument("--columnar", action="store_true", help="fill all rows at once with NumPy")
+    parser.add_argument("--seed", type=int, default=None, help="seed for --columnar")
+    args = parser.parse_args()
 
-    output_data.append(record)
+    # Load the original CSV with 50,000 employees
+    df = pd.read_csv(args.input)
 
-# Create and save new DataFrame
-output_df = pd.DataFrame(output_data)
-output_csv = "enriched_employee_dataset_50000.csv"
-output_df.to_csv(output_csv, index=False)
+    # Create and save new DataFrame
+    output_df = enrich_columnar(df, seed=args.seed) if args.columnar else enrich_rows(df)
+    output_df.to_csv(args.output, index=False)
 
-print(f"File saved: {output_csv}")
\ No newline at end of file
+    print(f"File saved: {args.output}")
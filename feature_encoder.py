@@ -0,0 +1,46 @@
+import zlib
+
+# Codes for fields outside the table start here, so they never clash with it
+UNKNOWN_FIELD_BASE = 1000
+
+
+class FeatureEncoder:
+    """
+    Turns (user_id, field) pairs into the model's numeric features.
+
+    Field codes come from a precomputed table (template bank order, so a
+    catalog field_id is already its code); any other field gets a crc32-based
+    code. Unlike hash(), both are the same in every
+    process, so encoded features can be cached, shared and reused by saved
+    models.
+    """
+
+    def __init__(self, fields=()):
+        self.field_codes = {field: i for i, field in enumerate(fields)}
+
+    def field_code(self, field):
+        if isinstance(field, int):
+            return field
+        code = self.field_codes.get(field)
+        if code is None:
+            code = UNKNOWN_FIELD_BASE + zlib.crc32(str(field).encode("utf-8")) % UNKNOWN_FIELD_BASE
+            self.field_codes[field] = code
+        return code
+
+    def encode(self, user_id, field):
+        """Feature row for one pair; raises ValueError for a non-numeric user ID."""
+        return [int(user_id), self.field_code(field)]
+
+    def encode_batch(self, user_ids, fields):
+        """
+        Encode many pairs at once. Returns (X, ok) where `ok` flags the rows
+        whose user ID was numeric; X holds only those rows.
+        """
+        import numpy as np
+
+        user_ids = [str(u).strip() for u in user_ids]
+        ok = np.fromiter((u.isdigit() for u in user_ids), dtype=bool, count=len(user_ids))
+        X = np.empty((int(ok.sum()), 2), dtype=np.int64)
+        X[:, 0] = [int(u) for u, good in zip(user_ids, ok) if good]
+        X[:, 1] = [self.field_code(f) for f, good in zip(fields, ok) if good]
+        return X, ok
@@ -0,0 +1,102 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class FieldHistoryStore:
+    """
+    Per-user record of which fields have already been asked, kept in SQLite.
+
+    Reads and writes touch one user at a time. Updates are buffered and
+    written in one transaction once `batch_size` users are dirty or
+    `flush_interval` seconds have passed, so asking questions no longer costs
+    a rewrite of every user's history.
+    """
+
+    def __init__(self, path="question_history.db", flush_interval=1.0, batch_size=100,
+                 legacy_json="question_history.json"):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._dirty = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS field_history (user_id TEXT PRIMARY KEY, fields TEXT NOT NULL)")
+        self._db.commit()
+        if legacy_json:
+            self._import_legacy(legacy_json)
+
+    def _import_legacy(self, json_path):
+        """One-time migration of the old whole-file question_history.json."""
+        if not os.path.exists(json_path):
+            return
+        if self._db.execute("SELECT 1 FROM field_history LIMIT 1").fetchone():
+            return
+        try:
+            with open(json_path) as f:
+                history = json.load(f)
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO field_history VALUES (?, ?)",
+                    ((str(uid), json.dumps(fields)) for uid, fields in history.items()),
+                )
+        except Exception as e:
+            print(f"Warning: Failed to import {json_path}: {e}")
+
+    def get(self, user_id):
+        """Fields already asked for `user_id` (a fresh list)."""
+        user_id = str(user_id)
+        with self._lock:
+            if user_id in self._dirty:
+                return list(self._dirty[user_id])
+            row = self._db.execute("SELECT fields FROM field_history WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def set(self, user_id, fields):
+        with self._lock:
+            self._dirty[str(user_id)] = list(fields)
+            due = (len(self._dirty) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._dirty = self._dirty, {}
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO field_history VALUES (?, ?)",
+                        ((uid, json.dumps(fields)) for uid, fields in pending.items()),
+                    )
+            except Exception as e:
+                # Keep the updates so the next flush can retry them
+                for uid, fields in pending.items():
+                    self._dirty.setdefault(uid, fields)
+                print(f"Warning: Failed to save field history: {e}")
+
+    def items(self):
+        """All (user_id, fields) pairs, e.g. for re-sharding."""
+        self.flush()
+        with self._lock:
+            rows = self._db.execute("SELECT user_id, fields FROM field_history").fetchall()
+        return [(uid, json.loads(fields)) for uid, fields in rows]
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM field_history").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,193 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from answer_index import AnswerIndex, update_answer_index
+from csv_to_json import clean_record
+from employee_store import EmployeeStore, compact_employee_store, write_delta
+from enrich_employee_data import enrich_columnar
+from intial_50000_data import NameEngine, allocate_employee_ids
+
+ACTIONS = ("add", "update", "remove")
+# Compact once there are this many delta segments, or once they hold this
+# share of the base rows, whichever comes first
+COMPACT_SEGMENTS = 8
+COMPACT_RATIO = 0.1
+
+
+def read_delta(path):
+    """
+    An HR delta as a DataFrame of strings. Columns: `Action` (add, update
+    or remove), `Employee ID`, and optionally `Employee Name` and any
+    profile fields. Empty cells mean "not given"; "NA" clears a field.
+    """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df.columns = [c.strip() for c in df.columns]
+    if "Action" not in df.columns:
+        raise ValueError(f"{path} has no Action column")
+    df["Action"] = df["Action"].str.strip().str.lower()
+    unknown = sorted(set(df["Action"]) - set(ACTIONS))
+    if unknown:
+        raise ValueError(f"Unknown actions in {path}: {unknown}, expected one of {ACTIONS}")
+    if "Employee ID" not in df.columns:
+        df["Employee ID"] = ""
+    return df
+
+
+def _given(row, columns):
+    return {c: row[c].strip() for c in columns if row[c].strip()}
+
+
+def _new_employees(store, rows, extra, seed):
+    """
+    Full records for `rows` (given values) plus `extra` synthetic hires.
+    Missing IDs are allocated against the store's ID index, missing names
+    from the name pools, and only these rows are enriched.
+    """
+    rng = np.random.default_rng(seed)
+    count = len(rows) + extra
+    given_ids = [r["Employee ID"] for r in rows if r.get("Employee ID")]
+    for employee_id in given_ids:
+        if employee_id in store:
+            raise ValueError(f"Cannot add Employee ID {employee_id}: it already exists")
+
+    missing_ids = count - len(given_ids)
+    used = np.concatenate([store.ids(), np.array([int(i) for i in given_ids if i.isdigit()], dtype=np.int64)])
+    new_ids = iter(allocate_employee_ids(missing_ids, used_ids=used, seed=rng).tolist())
+
+    missing_names = count - sum(1 for r in rows if r.get("Employee Name"))
+    new_names = iter(())
+    if missing_names:
+        # Names have no index, so this is the one step that reads every record
+        name_engine = NameEngine()
+        name_engine.reserve(record["Employee Name"] for record in store)
+        name_engine.reserve(r["Employee Name"] for r in rows if r.get("Employee Name"))
+        new_names = iter(name_engine.generate(missing_names, seed=rng).tolist())
+
+    rows = rows + [{} for _ in range(extra)]
+    df = pd.DataFrame({
+        "Employee Name": [r.get("Employee Name") or next(new_names) for r in rows],
+        "Employee ID": [r.get("Employee ID") or next(new_ids) for r in rows],
+    })
+    enriched = enrich_columnar(df, seed=rng).to_dict(orient="records")
+    # Values from the delta win over generated ones
+    return [{**clean_record(record), **given} for record, given in zip(enriched, rows)]
+
+
+def apply_delta(store_path="employee_store.bin", delta=None, add_synthetic=0, seed=None,
+                answer_index_path="answer_index.bin", compact_segments=COMPACT_SEGMENTS,
+                compact_ratio=COMPACT_RATIO):
+    """
+    Apply an HR delta (a path or DataFrame, see `read_delta`) and/or
+    `add_synthetic` generated hires to the store as one delta segment.
+
+    Only affected rows are generated or touched. A fresh answer index is
+    updated in place, and the store is compacted once deltas pile up.
+    """
+    if isinstance(delta, str):
+        delta = read_delta(delta)
+    if delta is None:
+        delta = pd.DataFrame(columns=["Action", "Employee ID"])
+
+    with EmployeeStore(store_path) as store:
+        ids = [i.strip() for i in delta["Employee ID"]]
+        seen = [i for i in ids if i]
+        if len(seen) != len(set(seen)):
+            duplicate = next(i for i in seen if seen.count(i) > 1)
+            raise ValueError(f"Employee ID {duplicate} appears more than once in the delta")
+
+        columns = [c for c in delta.columns if c != "Action"]
+        added, updated, old_records, deletes = [], [], [], []
+        for _, row in delta.iterrows():
+            action, given = row["Action"], _given(row, columns)
+            employee_id = given.get("Employee ID")
+            if action == "add":
+                added.append(given)
+                continue
+            if not employee_id:
+                raise ValueError(f"A {action} row has no Employee ID")
+            old = store.get(employee_id)
+            if old is None:
+                if action == "remove":
+                    print(f"Warning: Employee ID {employee_id} to remove is not in {store_path}")
+                    continue
+                raise ValueError(f"Cannot update Employee ID {employee_id}: it does not exist")
+            old_records.append(old)
+            if action == "remove":
+                deletes.append(employee_id)
+            else:
+                updated.append({**old, **given})
+
+        if added or add_synthetic:
+            added = _new_employees(store, added, add_synthetic, seed)
+        base_rows = len(store.base.ids)
+
+    summary = {"added": len(added), "updated": len(updated), "removed": len(deletes),
+               "delta": None, "compacted": 0}
+    if not (added or updated or deletes):
+        return summary
+
+    index_fresh = _index_fresh(answer_index_path, store_path)
+    summary["delta"] = write_delta(store_path, added + updated, deletes)
+    if index_fresh:
+        update_answer_index(answer_index_path, store_path, removed=old_records, added=added + updated)
+    elif answer_index_path and os.path.exists(answer_index_path):
+        print(f"Warning: {answer_index_path} was already stale; rebuild it with `python answer_index.py`")
+
+    with EmployeeStore(store_path) as store:
+        segments = len(store.deltas)
+        delta_rows = sum(len(segment.ids) for segment in store.deltas)
+    if segments >= compact_segments or delta_rows >= compact_ratio * base_rows:
+        summary["compacted"] = compact(store_path, answer_index_path if index_fresh else None)
+    return summary
+
+
+def _index_fresh(index_path, store_path):
+    """Whether the answer index at `index_path` matches the store as it is now."""
+    if not index_path or not os.path.exists(index_path):
+        return False
+    try:
+        index = AnswerIndex(index_path)
+    except ValueError:
+        return False
+    try:
+        return index.matches_source(store_path)
+    finally:
+        index.close()
+
+
+def compact(store_path="employee_store.bin", answer_index_path="answer_index.bin"):
+    """Merge delta segments into the base; a fresh answer index stays valid."""
+    index_fresh = _index_fresh(answer_index_path, store_path)
+    merged = compact_employee_store(store_path)
+    if merged and index_fresh:
+        # Same records, new files: only the signature changes
+        update_answer_index(answer_index_path, store_path)
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply an HR delta to the employee store without regenerating it.")
+    parser.add_argument("--store", default="employee_store.bin")
+    parser.add_argument("--delta", default=None, help="CSV with Action (add/update/remove), Employee ID, fields...")
+    parser.add_argument("--add-synthetic", type=int, default=0, help="also add N generated employees")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--answer-index", default="answer_index.bin")
+    parser.add_argument("--compact", action="store_true", help="merge all delta segments into the base now")
+    args = parser.parse_args()
+    if not (args.delta or args.add_synthetic or args.compact):
+        parser.error("nothing to do: give --delta, --add-synthetic or --compact")
+
+    start = time.perf_counter()
+    if args.delta or args.add_synthetic:
+        summary = apply_delta(args.store, args.delta, args.add_synthetic, args.seed, args.answer_index)
+        print(f"✅ Added {summary['added']}, updated {summary['updated']}, removed {summary['removed']} "
+              f"employees in {time.perf_counter() - start:.2f}s"
+              + (f" ({summary['delta']})" if summary["delta"] else "")
+              + (f", compacted {summary['compacted']} segments" if summary["compacted"] else ""))
+    if args.compact:
+        merged = compact(args.store, args.answer_index)
+        print(f"✅ Compacted {merged} delta segments into {args.store}")
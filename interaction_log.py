@@ -0,0 +1,359 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import threading
+import time
+
+SEGMENT_PATTERN = re.compile(r"segment-(\d+)\.ndjson$")
+ARCHIVE_PATTERN = re.compile(r"archive-(\d+)\.ndjson\.gz$")
+# How far back to look for the end of the last complete line of a segment
+_TAIL_BYTES = 1 << 16
+
+# How hard append() works to get entries onto disk:
+#   "always" - flush and fsync after every entry
+#   "batch"  - flush every entry, fsync every `fsync_every` entries or
+#              `fsync_interval` seconds, whichever comes first
+#   "none"   - leave it to the OS, flush every `fsync_every` entries
+DURABILITY_POLICIES = ("always", "batch", "none")
+
+# Entries in the compact ID form are stored as one JSON array per line in
+# this order instead of repeating the keys on every line
+ROW_FIELDS = ("user_id", "field_id", "template_id", "success", "ts", "user_answer")
+
+
+def _encode(entry):
+    if "template_id" not in entry:
+        # Older entries with field names and question text stay objects
+        return json.dumps(entry, separators=(",", ":"))
+    return json.dumps([entry["user_id"], entry["field_id"], entry["template_id"], entry["success"],
+                       entry.get("ts"), entry.get("user_answer", "")], separators=(",", ":"))
+
+
+def _decode(value):
+    return dict(zip(ROW_FIELDS, value)) if isinstance(value, list) else value
+
+
+class InteractionLog:
+    """
+    Append-only interaction log stored as NDJSON segments in `directory`.
+    Entries go in and come out as dicts; on disk they are `ROW_FIELDS` rows.
+
+    Appending an answer writes one line to the active segment, so its cost
+    doesn't depend on how much history exists. A crash can at worst leave a
+    partial last line, which is skipped on read. `compact()` rolls sealed
+    segments into gzipped archives.
+
+    `position()` names a point in the log as (segment number, byte offset)
+    that stays valid across restarts and compactions, and `read_from()`
+    reads only what was written after it. Appends may run on one thread
+    while others read.
+    """
+
+    def __init__(self, directory="logs", durability="batch", fsync_every=100,
+                 fsync_interval=1.0, segment_max_entries=100_000):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown durability policy {durability!r}, expected one of {DURABILITY_POLICIES}")
+        self.directory = directory
+        self.durability = durability
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.segment_max_entries = segment_max_entries
+        os.makedirs(os.path.join(directory, "archive"), exist_ok=True)
+
+        self._file = None
+        self._lock = threading.RLock()
+        self._segment_entries = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _numbered(self, directory, pattern):
+        found = []
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(directory, name)))
+        return sorted(found)
+
+    def segments(self):
+        return self._numbered(self.directory, SEGMENT_PATTERN)
+
+    def archives(self):
+        return self._numbered(os.path.join(self.directory, "archive"), ARCHIVE_PATTERN)
+
+    def _open_active(self):
+        segments = self.segments()
+        if segments:
+            number, path = segments[-1]
+            with open(path, "rb") as f:
+                lines = f.readlines()
+            self._segment_entries = len(lines)
+            if lines and not lines[-1].endswith(b"\n"):
+                # Terminate a torn last line so the next entry starts cleanly
+                with open(path, "ab") as f:
+                    f.write(b"\n")
+        else:
+            archives = self.archives()
+            number = archives[-1][0] + 1 if archives else 1
+            path = os.path.join(self.directory, f"segment-{number:06d}.ndjson")
+            self._segment_entries = 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._active_number = number
+
+    def _rotate(self):
+        self.sync()
+        self._file.close()
+        number = self._active_number + 1
+        path = os.path.join(self.directory, f"segment-{number:06d}.ndjson")
+        self._file = open(path, "a", encoding="utf-8")
+        self._active_number = number
+        self._segment_entries = 0
+
+    def append(self, entry):
+        with self._lock:
+            if self._file is None:
+                self._open_active()
+            self._file.write(_encode(entry) + "\n")
+            self._segment_entries += 1
+            self._unsynced += 1
+
+            if self.durability == "always":
+                self.sync()
+            elif self.durability == "batch":
+                self._file.flush()
+                if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                    self.sync()
+            elif self._unsynced >= self.fsync_every:
+                self._file.flush()
+                self._unsynced = 0
+
+            if self._segment_entries >= self.segment_max_entries:
+                self._rotate()
+
+    def extend(self, entries):
+        """
+        Append many entries with one flush at the end instead of one per
+        entry; "always" still syncs every entry.
+        """
+        if self.durability == "always":
+            for entry in entries:
+                self.append(entry)
+            return
+        with self._lock:
+            if self._file is None:
+                self._open_active()
+            for entry in entries:
+                self._file.write(_encode(entry) + "\n")
+                self._segment_entries += 1
+                self._unsynced += 1
+                if self._segment_entries >= self.segment_max_entries:
+                    self._rotate()
+
+            self._file.flush()
+            if self.durability == "batch":
+                if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                    self.sync()
+            elif self._unsynced >= self.fsync_every:
+                self._unsynced = 0
+
+    def sync(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            if self.durability != "none":
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self.sync()
+                self._file.close()
+                self._file = None
+
+    def _flush(self):
+        # Make everything appended so far visible to readers
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def _read_lines(self, path, opener=open, offset=0):
+        with opener(path, "rb") as f:
+            if offset:
+                f.seek(offset)
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield _decode(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn write from a crash; everything before it is intact
+                    print(f"Warning: Skipping corrupt log line in {path}")
+
+    def __iter__(self):
+        self._flush()
+        for _, path in self.archives():
+            yield from self._read_lines(path, gzip.open)
+        for _, path in self.segments():
+            yield from self._read_lines(path)
+
+    def position(self):
+        """
+        The end of the log as (segment number, byte offset): entries
+        appended from now on come after it.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                return self._active_number, os.fstat(self._file.fileno()).st_size
+            segments = self.segments()
+            if segments:
+                number, path = segments[-1]
+                return number, _complete_size(path)
+            archives = self.archives()
+            return (archives[-1][0] + 1 if archives else 1), 0
+
+    def read_from(self, position):
+        """
+        Iterator over the entries written after `position` (from
+        `position()`), or None if that point is not in this log: it was
+        compacted into an archive without an index, or the log was replaced.
+        """
+        number, offset = position
+        self._flush()
+        segments = self.segments()
+        archives = self.archives()
+        segment_path = dict(segments).get(number)
+        if segment_path is not None:
+            if not _at_line_start(segment_path, open, offset):
+                return None
+            return self._read_sources([(segment_path, open, offset)]
+                                      + [(p, open, 0) for n, p in segments if n > number])
+
+        later_segments = [(p, open, 0) for n, p in segments if n >= number]
+        for i, (archive_number, archive_path) in enumerate(archives):
+            if archive_number < number:
+                continue
+            start = _read_archive_index(archive_path).get(str(number))
+            if start is None or not _at_line_start(archive_path, gzip.open, start + offset):
+                return None
+            return self._read_sources([(archive_path, gzip.open, start + offset)]
+                                      + [(p, gzip.open, 0) for _, p in archives[i + 1:]] + later_segments)
+        # The position is the start of a segment that was never written to
+        if offset == 0 and all(n >= number for n, _ in segments):
+            return self._read_sources(later_segments)
+        return None
+
+    def _read_sources(self, sources):
+        for path, opener, offset in sources:
+            yield from self._read_lines(path, opener, offset)
+
+    def is_empty(self):
+        return not self.archives() and all(os.path.getsize(p) == 0 for _, p in self.segments())
+
+    def import_legacy(self, json_path):
+        """One-time migration of an old whole-file logs.json into the log."""
+        if not self.is_empty() or not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path) as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not import legacy logs from {json_path}: {e}")
+            return 0
+        self.extend(entries)
+        self.sync()
+        return len(entries)
+
+    def compact(self):
+        """
+        Roll every sealed segment into a new gzipped archive. The archive is
+        written to a temp file and renamed into place before any segment is
+        removed.
+
+        If this instance is appending, its active segment is sealed first.
+        Otherwise the newest segment is left alone: another process (e.g.
+        the running service) may still be appending to it.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._rotate()
+            segments = self.segments()
+            # Whoever appends only ever writes to the highest-numbered segment
+            active = self._active_number if self._file is not None else (segments[-1][0] if segments else None)
+            sealed = [(n, p) for n, p in segments if n < active and os.path.getsize(p) > 0] if segments else []
+        if not sealed:
+            return None
+
+        archive_path = os.path.join(self.directory, "archive", f"archive-{sealed[-1][0]:06d}.ndjson.gz")
+        tmp_path = archive_path + ".tmp"
+        # Where each segment starts in the uncompressed archive, so positions
+        # inside archived segments can still be read from (see read_from)
+        starts, size = {}, 0
+        with gzip.open(tmp_path, "wb") as out:
+            for number, path in sealed:
+                starts[str(number)] = size
+                with open(path, "rb") as f:
+                    for line in f:
+                        if line.endswith(b"\n"):
+                            out.write(line)
+                            size += len(line)
+        index_path = _archive_index_path(archive_path)
+        with open(index_path + ".tmp", "w") as f:
+            json.dump({"segments": starts}, f)
+        os.replace(index_path + ".tmp", index_path)
+        os.replace(tmp_path, archive_path)
+        for _, path in sealed:
+            os.remove(path)
+        return archive_path
+
+
+def _archive_index_path(archive_path):
+    return archive_path[:-len(".ndjson.gz")] + ".index.json"
+
+
+def _read_archive_index(archive_path):
+    """{segment number (str): uncompressed start offset}; empty for archives written without one."""
+    try:
+        with open(_archive_index_path(archive_path)) as f:
+            return json.load(f)["segments"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def _complete_size(path):
+    """Size of `path` up to the end of its last complete line; a torn last line is not part of the log."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.seek(max(0, size - _TAIL_BYTES))
+        tail = f.read()
+    return size - len(tail) + tail.rfind(b"\n") + 1
+
+
+def _at_line_start(path, opener, offset):
+    """Whether `offset` is within `path` and right after a newline, as any position() is."""
+    if offset == 0:
+        return True
+    with opener(path, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the append-only interaction log.")
+    parser.add_argument("command", choices=["compact", "import", "count"])
+    parser.add_argument("--dir", default="logs")
+    parser.add_argument("--legacy", default="logs.json", help="legacy JSON file for `import`")
+    args = parser.parse_args()
+
+    log = InteractionLog(args.dir)
+    if args.command == "compact":
+        print(f"✅ Compacted into {log.compact()}")
+    elif args.command == "import":
+        print(f"✅ Imported {log.import_legacy(args.legacy)} entries from {args.legacy}")
+    else:
+        print(sum(1 for _ in log))
+    log.close()
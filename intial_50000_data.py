@@ -1,49 +1,213 @@
 import pandas as pd
-from faker import Faker
+import numpy as np
+from faker.providers.person.en_IN import Provider
 import random
 
-# Load the first 10 employees from CSV
-df_initial = pd.read_csv("employees.csv")  # Make sure employees.csv is in the same folder
-
-# Setup Faker
-fake = Faker("en_IN")
-Faker.seed(0)
-
-# Track used names and IDs
-used_ids = set(df_initial["Employee ID"])
-used_names = set(df_initial["Employee Name"])
-
-# Function to generate a unique 10-digit employee ID starting with 2000
-def generate_unique_employee_id():
-    while True:
-        emp_id = "2000" + str(random.randint(100000, 999999))
-        if emp_id not in used_ids:
-            used_ids.add(emp_id)
-            return emp_id
-
-# Function to generate a unique employee name
-def generate_unique_name():
-    while True:
-        name = fake.name()
-        if name not in used_names:
-            used_names.add(name)
-            return name
-
-# Generate 49,990 additional unique employee records
-new_employees = []
-for _ in range(50000 - len(df_initial)):
-    new_employees.append({
-        "Employee Name": generate_unique_name(),
-        "Employee ID": generate_unique_employee_id()
-    })
+# Above this many slots the ID space is too big to materialize, so IDs are
+# drawn in batches and de-duplicated instead
+DENSE_SAMPLING_LIMIT = 1 << 24
+
+
+def _draw_unique(rng, space, count, excluded=0, is_excluded=None):
+    """Draw `count` distinct ints from [0, space), skipping excluded slots.
+
+    `excluded` is how many slots `is_excluded` flags inside the space, so the
+    dense path can over-draw by exactly that much and never has to retry.
+    """
+    if space <= DENSE_SAMPLING_LIMIT:
+        draw = rng.choice(space, size=min(space, count + excluded), replace=False)
+        if excluded:
+            draw = draw[~is_excluded(draw)]
+        return draw[:count].astype(np.int64)
+
+    picked = np.empty(0, dtype=np.int64)
+    while len(picked) < count:
+        need = count - len(picked)
+        batch = rng.integers(0, space, size=need + need // 8 + 64, dtype=np.int64)
+        if excluded:
+            batch = batch[~is_excluded(batch)]
+        picked = np.sort(np.concatenate([picked, batch]))
+        picked = picked[np.concatenate(([True], picked[1:] != picked[:-1]))]
+    # Sorting loses the draw order, so shuffle before truncating to keep the
+    # sample uniform
+    rng.shuffle(picked)
+    return picked[:count]
+
+
+def employee_id_capacity(used_ids=(), prefix="2000", width=6):
+    """Number of IDs still free for the given prefix/width."""
+    return (10 ** width - 10 ** (width - 1)) - len(_used_id_offsets(used_ids, prefix, width))
+
+
+def _used_id_offsets(used_ids, prefix, width):
+    low = 10 ** (width - 1)
+    if isinstance(used_ids, np.ndarray) and used_ids.dtype.kind in "iu" and not prefix.startswith("0"):
+        # Integer IDs, e.g. EmployeeStore.ids(): offsets in one vectorized pass
+        offsets = used_ids.astype(np.int64) - (int(prefix) * 10 ** width + low)
+        return np.unique(offsets[(offsets >= 0) & (offsets < 10 ** width - low)])
+    offsets = set()
+    for emp_id in used_ids:
+        emp_id = str(emp_id)
+        suffix = emp_id[len(prefix):]
+        if emp_id.startswith(prefix) and len(suffix) == width and suffix.isdigit() and suffix[0] != "0":
+            offsets.add(int(suffix) - low)
+    return np.array(sorted(offsets), dtype=np.int64)
+
+
+def allocate_employee_ids(count, used_ids=(), prefix="2000", width=6, seed=None):
+    """
+    Allocate `count` unique employee IDs of the form prefix + `width` digits
+    (no leading zero), skipping anything in `used_ids`.
+
+    IDs are sampled without replacement in one vectorized pass, so the cost
+    does not grow as the space fills up. Raises ValueError up front when the
+    space cannot hold `count` more IDs.
+    """
+    low, high = 10 ** (width - 1), 10 ** width
+    used = _used_id_offsets(used_ids, prefix, width)
+    capacity = (high - low) - len(used)
+    if count > capacity:
+        raise ValueError(
+            f"Cannot allocate {count} IDs with prefix {prefix!r} and width {width}: "
+            f"only {capacity} of {high - low} IDs are free"
+        )
+
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    offsets = _draw_unique(
+        rng, high - low, count,
+        excluded=len(used),
+        is_excluded=lambda draw: np.isin(draw, used, assume_unique=True),
+    )
+    return np.char.add(prefix, (offsets + low).astype(f"U{width}"))
+
+
+class NameEngine:
+    """
+    Builds unique "First Last" / "First Middle Last" names from the Faker
+    en_IN name pools.
+
+    Every name maps to an integer code, and taken codes are tracked in a
+    bitmap (one bit per possible name) instead of a set of strings. Two-part
+    names are handed out first; three-part names (middle name drawn from the
+    first-name pool) only once the two-part space is used up.
+    """
+
+    def __init__(self, first_names=None, last_names=None):
+        self.first_names = np.array(sorted(set(first_names or Provider.first_names)), dtype=object)
+        self.last_names = np.array(sorted(set(last_names or Provider.last_names)), dtype=object)
+        self._first_index = {n: i for i, n in enumerate(self.first_names)}
+        self._last_index = {n: i for i, n in enumerate(self.last_names)}
 
-# Create DataFrame from new records
-df_new = pd.DataFrame(new_employees)
+        n_first, n_last = len(self.first_names), len(self.last_names)
+        self.two_part_capacity = n_first * n_last
+        self.total_capacity = self.two_part_capacity + n_first * n_first * n_last
+        self._taken = np.zeros((self.total_capacity + 7) // 8, dtype=np.uint8)
+        self._taken_two_part = 0
+        self._taken_total = 0
+
+    @property
+    def capacity(self):
+        """How many more unique names the pools can produce."""
+        return self.total_capacity - self._taken_total
+
+    def _is_taken(self, codes):
+        return (self._taken[codes >> 3] >> (codes & 7).astype(np.uint8)) & 1 == 1
+
+    def _mark(self, codes):
+        np.bitwise_or.at(self._taken, codes >> 3, (1 << (codes & 7)).astype(np.uint8))
+        self._taken_two_part += int(np.count_nonzero(codes < self.two_part_capacity))
+        self._taken_total += len(codes)
+
+    def encode(self, name):
+        """Code for `name`, or None if it can't be built from the pools."""
+        n_first, n_last = len(self.first_names), len(self.last_names)
+        parts = str(name).split()
+        try:
+            if len(parts) == 2:
+                return self._first_index[parts[0]] * n_last + self._last_index[parts[1]]
+            if len(parts) == 3:
+                first, middle, last = (self._first_index[parts[0]], self._first_index[parts[1]],
+                                       self._last_index[parts[2]])
+                return self.two_part_capacity + (first * n_first + middle) * n_last + last
+        except KeyError:
+            pass
+        return None
+
+    def reserve(self, names):
+        """Mark existing names as used so they are never generated again."""
+        codes = {self.encode(n) for n in names} - {None}
+        codes = np.array(sorted(codes), dtype=np.int64)
+        if len(codes):
+            self._mark(codes[~self._is_taken(codes)])
+
+    def decode(self, codes):
+        n_first, n_last = len(self.first_names), len(self.last_names)
+        codes = np.asarray(codes, dtype=np.int64)
+        names = np.empty(len(codes), dtype=object)
+
+        two = codes < self.two_part_capacity
+        first, last = np.divmod(codes[two], n_last)
+        names[two] = [f"{f} {l}" for f, l in zip(self.first_names[first], self.last_names[last])]
+
+        rest, last = np.divmod(codes[~two] - self.two_part_capacity, n_last)
+        first, middle = np.divmod(rest, n_first)
+        names[~two] = [
+            f"{f} {m} {l}"
+            for f, m, l in zip(self.first_names[first], self.first_names[middle], self.last_names[last])
+        ]
+        return names
+
+    def sample_codes(self, count, seed=None):
+        """Reserve `count` unused name codes without building the strings."""
+        if count > self.capacity:
+            raise ValueError(
+                f"Cannot generate {count} unique names: the name pools only have "
+                f"{self.capacity} of {self.total_capacity} names left"
+            )
+        rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+        two_part_free = self.two_part_capacity - self._taken_two_part
+        n_two = min(count, two_part_free)
+        codes = [_draw_unique(rng, self.two_part_capacity, n_two,
+                              excluded=self._taken_two_part, is_excluded=self._is_taken)]
+        if count > n_two:
+            offset = self.two_part_capacity
+            codes.append(offset + _draw_unique(
+                rng, self.total_capacity - offset, count - n_two,
+                excluded=self._taken_total - self._taken_two_part,
+                is_excluded=lambda draw: self._is_taken(draw + offset),
+            ))
+        codes = np.concatenate(codes)
+        self._mark(codes)
+        return codes
+
+    def generate(self, count, seed=None):
+        """Return `count` new unique names as an object array."""
+        return self.decode(self.sample_codes(count, seed))
+
+
+if __name__ == "__main__":
+    # Load the first 10 employees from CSV
+    df_initial = pd.read_csv("employees.csv", dtype={"Employee ID": str})  # Make sure employees.csv is in the same folder
+
+    # Track used names
+    name_engine = NameEngine()
+    name_engine.reserve(df_initial["Employee Name"])
+
+    # Generate 49,990 additional unique employee records
+    new_count = 50000 - len(df_initial)
+    new_ids = allocate_employee_ids(new_count, used_ids=df_initial["Employee ID"], seed=random.randrange(2 ** 32))
+
+    # Create DataFrame from new records
+    df_new = pd.DataFrame({
+        "Employee Name": name_engine.generate(new_count, seed=random.randrange(2 ** 32)),
+        "Employee ID": new_ids
+    })
 
-# Combine initial and new records
-df_full = pd.concat([df_initial, df_new], ignore_index=True)
+    # Combine initial and new records
+    df_full = pd.concat([df_initial, df_new], ignore_index=True)
 
-# Save to a new CSV file
-df_full.to_csv("50000_employees.csv", index=False)
+    # Save to a new CSV file
+    df_full.to_csv("50000_employees.csv", index=False)
 
-print("✅ File '50000_employees.csv' created with 50,000 unique employees.")
\ No newline at end of file
+    print("✅ File '50000_employees.csv' created with 50,000 unique employees.")
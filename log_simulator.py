@@ -0,0 +1,126 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from employee_dataset import EmployeeDataset
+from interaction_log import InteractionLog
+from template_catalog import TemplateCatalog
+
+DAY = 86400
+
+
+def dataset_user_ids(dataset):
+    """Employee IDs of `dataset` as an array of strings."""
+    if dataset.store is not None:
+        return dataset.store.ids().astype(str)
+    return np.array([str(r.get("Employee ID", "")) for r in dataset], dtype=str)
+
+
+class LogSimulator:
+    """
+    Vectorized generator of synthetic interaction logs in the compact
+    log format, drawn against the catalog's active templates.
+
+    Every template gets a fixed success probability: its field's rate
+    (`field_success` by field name, else `default_success`), overridden by
+    `template_success` by template ID, otherwise jittered by
+    `template_spread`. Users are drawn with a Zipf-like activity skew
+    (0 = uniform) and timestamps are spread evenly over the given window,
+    in order.
+    """
+
+    def __init__(self, user_ids, catalog, default_success=0.8, field_success=None,
+                 template_success=None, template_spread=0.1, activity_skew=0.5, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.user_ids = np.asarray(user_ids, dtype=str)
+        if not len(self.user_ids):
+            raise ValueError("No users to simulate")
+
+        # Flatten the active templates so a field's templates are one slice
+        self.field_ids = np.array([f for f in range(len(catalog.fields)) if catalog.templates_for(f)], dtype=np.int64)
+        if not len(self.field_ids):
+            raise ValueError("The template catalog has no active templates")
+        per_field = [catalog.templates_for(int(f)) for f in self.field_ids]
+        self.counts = np.array([len(t) for t in per_field], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        self.template_ids = np.concatenate([np.asarray(t, dtype=np.int64) for t in per_field])
+        template_fields = np.repeat(self.field_ids, self.counts)
+
+        field_success = field_success or {}
+        template_success = {int(t): p for t, p in (template_success or {}).items()}
+        base = np.array([field_success.get(catalog.field_name(int(f)), default_success) for f in template_fields])
+        jitter = self.rng.normal(0.0, template_spread, len(base)) if template_spread else 0.0
+        success = np.clip(base + jitter, 0.01, 0.99)
+        for i, template_id in enumerate(self.template_ids.tolist()):
+            if template_id in template_success:
+                success[i] = template_success[template_id]
+        self.success_rates = success
+
+        weights = 1.0 / np.arange(1, len(self.user_ids) + 1) ** activity_skew
+        # Which users are the busy ones is random, not dataset order
+        self.activity = self.rng.permutation(weights / weights.sum())
+
+    def chunks(self, count, start=None, end=None, chunk_size=100_000):
+        """Yield lists of log entries, `count` in total, timestamped within [start, end)."""
+        end = time.time() if end is None else end
+        start = end - 30 * DAY if start is None else start
+        step = (end - start) / count if count else 0.0
+        done = 0
+        while done < count:
+            n = min(chunk_size, count - done)
+            users = self.user_ids[self.rng.choice(len(self.user_ids), size=n, p=self.activity)]
+            fields = self.rng.integers(len(self.field_ids), size=n)
+            slots = self.offsets[fields] + (self.rng.random(n) * self.counts[fields]).astype(np.int64)
+            success = self.rng.random(n) < self.success_rates[slots]
+            lo = start + done * step
+            ts = np.round(np.sort(self.rng.uniform(lo, lo + n * step, n)), 3)
+
+            yield [
+                {"user_id": u, "field_id": f, "template_id": t,
+                 "user_answer": "simulated" if s else "invalid response", "success": int(s), "ts": when}
+                for u, f, t, s, when in zip(users.tolist(), self.field_ids[fields].tolist(),
+                                            self.template_ids[slots].tolist(), success.tolist(), ts.tolist())
+            ]
+            done += n
+
+    def write(self, log_store, count, start=None, end=None, chunk_size=100_000, on_chunk=None):
+        """Stream `count` entries into `log_store`; `on_chunk(entries)` sees each batch."""
+        for entries in self.chunks(count, start, end, chunk_size):
+            log_store.extend(entries)
+            if on_chunk is not None:
+                on_chunk(entries)
+        log_store.sync()
+        return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic interaction logs for benchmarking.")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--data", default="employee_store.bin", help="employee store or JSON dataset")
+    parser.add_argument("--logs", default="logs", help="interaction log directory to append to")
+    parser.add_argument("--bank", default="template_bank.json")
+    parser.add_argument("--catalog", default="template_catalog.json")
+    parser.add_argument("--success", type=float, default=0.8, help="default success rate")
+    parser.add_argument("--field-success", default=None, help="JSON object of {field name: success rate}")
+    parser.add_argument("--template-success", default=None, help="JSON object of {template_id: success rate}")
+    parser.add_argument("--template-spread", type=float, default=0.1)
+    parser.add_argument("--skew", type=float, default=0.5, help="user activity skew (0 = uniform)")
+    parser.add_argument("--days", type=float, default=30, help="spread timestamps over the last N days")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    simulator = LogSimulator(
+        dataset_user_ids(EmployeeDataset(args.data)), TemplateCatalog.build(args.bank, args.catalog),
+        default_success=args.success,
+        field_success=json.loads(args.field_success) if args.field_success else None,
+        template_success=json.loads(args.template_success) if args.template_success else None,
+        template_spread=args.template_spread, activity_skew=args.skew, seed=args.seed,
+    )
+    log_store = InteractionLog(args.logs, durability="none")
+    start = time.perf_counter()
+    now = time.time()
+    simulator.write(log_store, args.count, start=now - args.days * DAY, end=now)
+    log_store.close()
+    print(f"✅ Wrote {args.count} logs to {args.logs} in {time.perf_counter() - start:.1f}s")
@@ -1,41 +1,42 @@
 # === main.py ===
-import json
+import time
+_started = time.perf_counter()
+
+import os
 from ml_selector import FieldTemplateSelector
 from question_asker import QuestionAsker
+from employee_dataset import EmployeeDataset
+from metrics import REGISTRY
 
-# Load enriched employee data
-with open("enriched_employee_dataset_50000.json") as f:
-    user_data = json.load(f)
+import_seconds = time.perf_counter() - _started
+REGISTRY.observe("startup_imports", import_seconds)
 
-# Load logs
-try:
-    with open("logs.json") as f:
-        logs = json.load(f)
-except FileNotFoundError:
-    logs = []
+STORE_PATH = "employee_store.bin"
 
-# Initialize the FieldTemplateSelector
-selector = FieldTemplateSelector()
+# Load enriched employee data once (build the store with `python employee_store.py`
+# and its answer index with `python answer_index.py`)
+dataset = EmployeeDataset(STORE_PATH if os.path.exists(STORE_PATH) else "enriched_employee_dataset_50000.json")
 
-# Load existing logs into selector RL and logs list, then train ML
-if logs:
-    for log in logs:
-        # Directly update RL Q-table without triggering repeated training
-        reward = 1 if log.get('success', False) else -1
-        selector.rl_selector.update_q(log['user_id'], log['field'], log['template'], reward)
-        selector.logs.append(log)  # Append log without triggering training
+# Initialize the FieldTemplateSelector
+selector = FieldTemplateSelector(dataset)
 
-    # Train ML model only once after loading all logs
-    selector.train_supervised()
+# The selector restores RL state from its checkpoint and replays newer logs;
+# the ML model is loaded or trained in the background on top of that
+if selector.log_count:
+    selector.train_supervised_in_background()
 
 # Initialize question engine
-asker = QuestionAsker(selector)
+asker = QuestionAsker(selector, dataset)
+
+startup_seconds = time.perf_counter() - _started - import_seconds
+REGISTRY.observe("startup", startup_seconds)
+print(f"Ready in {import_seconds + startup_seconds:.2f}s (imports {import_seconds:.2f}s, startup {startup_seconds:.2f}s)")
 
 # === Step 1: Ask for employee ID ===
 input_id = input("Enter your Employee ID: ").strip()
 
 # === Step 2: Find employee record ===
-record = next((r for r in user_data if str(r["Employee ID"]) == input_id), None)
+record = dataset.get(input_id)
 
 if record:
     user_id = str(record["Employee ID"])
@@ -51,12 +52,7 @@ if record:
     for field, template, question in questions:
         print(f"❓ {question}")
         user_answer = input("👉 Your answer: ").strip()
-        correct_answer = record.get(field, "")
-        # Normalize correct_answer to list for consistency
-        correct_answers = [correct_answer] if not isinstance(correct_answer, list) else correct_answer
-        asker.record_user_answer(user_id, field, template, user_answer, correct_answers)
-
-        if user_answer.lower() not in [ans.lower() for ans in correct_answers]:
+        if not asker.record_user_answer(user_id, field, template, user_answer):
             all_correct = False
 
     # === Step 4: Final Access Decision ===
@@ -67,3 +63,10 @@ if record:
 
 else:
     print("❌ Employee ID not found. Please check and try again.")
+
+# Make sure buffered log entries and RL state reach the disk
+selector.trainer.stop()
+selector.log_store.close()
+asker.close()
+selector.save_checkpoint()
+selector.save_model_artifact()
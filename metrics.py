@@ -0,0 +1,248 @@
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+
+# Stage latency buckets in seconds, from a dict lookup to a model refit
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "verification"
+
+
+class Histogram:
+    # No lock: observe() sits on paths called millions of times, and under
+    # the GIL a rare lost increment from a racing thread is acceptable here
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def clear(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+class Registry:
+    """
+    Process-wide stage timers, counters and gauges.
+
+    Timers record into per-stage histograms; recording costs a couple of
+    perf_counter calls and a bisect, and nothing at all once `enabled` is
+    False. `render()` produces the Prometheus text format.
+    """
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self.enabled = True
+        self.stages = {}
+        self.errors = _Tally()
+        self.counters = _Tally()
+        self.gauges = {}
+        # thread id -> stack of stage names currently running; only kept
+        # while a SamplingProfiler is attached, since it costs a bit per call
+        self.track_stages = False
+        self.active = {}
+
+    def _histogram(self, stage):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages.setdefault(stage, Histogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        if self.enabled:
+            self._histogram(stage).observe(seconds)
+
+    def inc(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] += amount
+
+    def gauge(self, name, fn):
+        """Report `fn()` as gauge `name` at export time."""
+        self.gauges[name] = fn
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    def render(self):
+        p = self.prefix
+        lines = [f"# HELP {p}_stage_seconds Time spent per stage.", f"# TYPE {p}_stage_seconds histogram"]
+        for stage, h in sorted(self.stages.items()):
+            counts, total = list(h.counts), h.sum
+            count = sum(counts)  # keeps +Inf consistent with the buckets mid-update
+            cumulative = 0
+            for bound, n in zip(h.buckets, counts):
+                cumulative += n
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        lines += [f"# HELP {p}_stage_errors_total Stages that raised.", f"# TYPE {p}_stage_errors_total counter"]
+        for stage, n in sorted(self.errors.items()):
+            lines.append(f'{p}_stage_errors_total{{stage="{stage}"}} {n}')
+
+        for name, n in sorted(self.counters.items()):
+            lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {n}"]
+        for name, fn in sorted(self.gauges.items()):
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            lines += [f"# TYPE {p}_{name} gauge", f"{p}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the text format atomically, e.g. for the node_exporter textfile collector."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        for histogram in self.stages.values():
+            histogram.clear()
+        self.errors.clear()
+        self.counters.clear()
+
+
+class _Timer:
+    __slots__ = ("registry", "stage", "start")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        if self.registry.track_stages:
+            self.registry.active.setdefault(threading.get_ident(), []).append(self.stage)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        registry = self.registry
+        if not registry.enabled:
+            return False
+        registry.observe(self.stage, time.perf_counter() - self.start)
+        if exc_type is not None:
+            registry.errors[self.stage] += 1
+        if registry.track_stages:
+            stack = registry.active.get(threading.get_ident())
+            if stack:
+                stack.pop()
+        return False
+
+
+REGISTRY = Registry()
+
+
+def timed(stage, registry=REGISTRY):
+    """Decorator recording every call of the function as `stage`."""
+    def decorate(fn):
+        histogram = registry._histogram(stage)
+        perf_counter = time.perf_counter
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            if registry.track_stages:
+                with _Timer(registry, stage):
+                    return fn(*args, **kwargs)
+            # Hot path (e.g. update_q during replay): no Timer object
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                registry.errors[stage] += 1
+                raise
+            finally:
+                histogram.observe(perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def start_http_server(port=9108, host="127.0.0.1", registry=REGISTRY):
+    """Serve GET /metrics from a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
+
+
+class SamplingProfiler:
+    """
+    Periodically samples every thread's Python stack and counts them in
+    folded form ("stage;file:function;..."), ready for flamegraph.pl or
+    speedscope. The innermost active stage timer is used as the root frame,
+    so slow samples can be attributed to a stage.
+    """
+
+    def __init__(self, interval=0.005, registry=REGISTRY, max_depth=40):
+        self.interval = interval
+        self.registry = registry
+        self.max_depth = max_depth
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.registry.track_stages = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.registry.track_stages = False
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stages = self.registry.active.get(thread_id)
+                stack.append(stages[-1] if stages else "idle")
+                self.samples[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            for stack, n in self.samples.most_common():
+                f.write(f"{stack} {n}\n")
@@ -1,232 +1,410 @@
-import json
+import itertools
 import random
-import numpy as np
-from pathlib import Path
-from collections import defaultdict, deque
-from sklearn.ensemble import RandomForestClassifier
-
-class RLSelector:
-    def __init__(self):
-        self.q_table = defaultdict(float)
-        self.recent_templates = defaultdict(lambda: deque(maxlen=3))
-
-    def update_q(self, user_id, field, template, reward):
-        key = (user_id, field, template)
-        current_q = self.q_table.get(key, 0.0)
-        learning_rate = 0.1
-        discount_factor = 0.9
-        new_q = current_q + learning_rate * (
-            reward + discount_factor * self._max_future_q(user_id, field) - current_q
-        )
-        self.q_table[key] = new_q
-        self.recent_templates[(user_id, field)].append(template)
-
-    def _max_future_q(self, user_id, field):
-        keys = [k for k in self.q_table if k[0] == user_id and k[1] == field]
-        if not keys:
-            return 0.0
-        return max(self.q_table[k] for k in keys)
-
-    def select_best(self, user_id, candidates, k=3):
-        filtered_candidates = []
-        for field, template in candidates:
-            recent_for_field = self.recent_templates.get((user_id, field), deque())
-            if template not in recent_for_field:
-                filtered_candidates.append((field, template))
-
-        if not filtered_candidates:
-            for field, _ in candidates:
-                self.recent_templates[(user_id, field)].clear()
-            filtered_candidates = candidates
-
-        filtered_candidates.sort(
-            key=lambda ft: self.q_table.get((user_id, ft[0], ft[1]), 0.0), reverse=True
-        )
-
-        return filtered_candidates[:k]
+import threading
+import time
+from collections import deque
+from employee_dataset import EmployeeDataset
+from rl_selector import RLSelector, list_checkpoints
+from interaction_log import InteractionLog
+from model_trainer import BackgroundTrainer
+from feature_encoder import FeatureEncoder
+from template_catalog import TemplateCatalog
+from metrics import REGISTRY, timed
+from model_artifacts import ModelArtifactStore
+
+# Most recent logs kept in memory, e.g. for drift checks; the full history
+# is streamed from the log store when training
+RECENT_LOGS = 10_000
 
 class FieldTemplateSelector:
-    def __init__(self):
-        self.field_model = RandomForestClassifier()
-        self.template_model = RandomForestClassifier()
-        self.rl_selector = RLSelector()
-        self.logs = []
-        self.valid_users = set()
-        self.cleaned_data = {}
-
-        self.template_bank_path = "template_bank.json"
-        self.template_bank = self._load_template_bank(self.template_bank_path)
-
-        data_path = "/Users/jaiharishsatheshkumar/synthetic_data_generator/enriched_employee_dataset_50000.json"
-        logs_path = "logs.json"
-
-        self._load_valid_users(data_path)
-        self._load_existing_logs(logs_path)
-        self._load_cleaned_data(data_path)
-        self.generate_small_logs(data_path, logs_path, 5000)
-
-    def _load_template_bank(self, path):
+    def __init__(self, dataset=None, log_store=None, legacy_logs_path="logs.json", trainer=None,
+                 checkpoint_dir="checkpoints", checkpoint_every=1000,
+                 template_bank_path="template_bank.json", seed_log_count=5000,
+                 catalog_path="template_catalog.json", recent_max_entries=200_000, recent_ttl=None,
+                 model_dir="models", catalog_read_only=False):
+        # sklearn is imported on the first fit or artifact load, not here
+        self.field_model = None
+        # Bumped on every swap; 0 means no model has been fitted yet
+        self.model_version = 0
+        self.model_log_count = 0
+        self.model_fingerprint = None
+        self.model_success_rate = None
+        self._model_lock = threading.Lock()
+        # Trained models keyed by a fingerprint of their logs; see model_artifacts.py
+        self.model_store = ModelArtifactStore(model_dir) if model_dir else None
+        self._pending_artifact = None
+        # Bounds for the per-(user, field) recent-template state
+        self.rl_options = {"recent_max_entries": recent_max_entries, "recent_ttl": recent_ttl}
+        self.rl_selector = RLSelector(**self.rl_options)
+        self.log_count = 0
+        self.recent_logs = deque(maxlen=RECENT_LOGS)
+        # Parsed once and shared; valid users and answers are built lazily
+        self.dataset = dataset if dataset is not None else EmployeeDataset()
+
+        self.template_bank_path = template_bank_path
+        # Fields and templates are referred to by integer ID everywhere but the UI
+        self.catalog_path = catalog_path
+        # Shard workers share one catalog file and never write it (see sharding.py)
+        self.catalog_read_only = catalog_read_only
+        self.catalog = TemplateCatalog.build(template_bank_path, catalog_path, read_only=catalog_read_only)
+        # Stable (user, field) features shared by training and validation
+        self.encoder = FeatureEncoder(self.catalog.fields)
+
+        # Answers are appended to NDJSON segments instead of rewriting logs.json
+        self.log_store = log_store if log_store is not None else InteractionLog("logs")
+        self.log_store.import_legacy(legacy_logs_path)
+
+        # RL state is restored from the latest checkpoint; only logs written
+        # after its position in the log store are read and replayed
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_offset = 0
+        self._checkpoint_writer = None
+        self._load_existing_logs()
+        self.generate_small_logs(seed_log_count)
+
+        # Retraining happens off the request path; see model_trainer.py
+        self.trainer = trainer if trainer is not None else BackgroundTrainer(self)
+        self.trainer.start()
+
+        REGISTRY.gauge("interaction_logs", lambda: self.log_count)
+        REGISTRY.gauge("model_version", lambda: self.model_version)
+        REGISTRY.gauge("recent_template_entries", lambda: len(self.rl_selector.recent_templates))
+
+    @property
+    def valid_users(self):
+        return self.dataset.valid_users
+
+    def _ids(self, field, template):
+        """(field_id, template_id) for a field name and a template ID or text."""
+        field_id = self.catalog.field_id(field, create=True)
+        if not isinstance(template, int):
+            template = self.catalog.template_id(field_id, template, create=True)
+        return field_id, template
+
+    def _resume_from_checkpoint(self):
+        """
+        Restore RL state from the newest usable checkpoint and return the
+        log entries written after it, or None if the whole log must be
+        replayed.
+        """
+        for _, path in reversed(list_checkpoints(self.checkpoint_dir)):
+            try:
+                rl_selector, offset, position = RLSelector.load_checkpoint(path, **self.rl_options)
+            except Exception as e:
+                print(f"Warning: Could not load checkpoint {path}: {e}")
+                continue
+            # No position (an older checkpoint), or one this log doesn't have:
+            # it belongs to some other history
+            entries = self.log_store.read_from(position) if position is not None else None
+            if entries is None:
+                continue
+            self.rl_selector, self.checkpoint_offset, self.log_count = rl_selector, offset, offset
+            return entries
+        return None
+
+    def _replay(self, log):
+        self.recent_logs.append(log)
+        self.log_count += 1
+        self.rl_selector.update_q(log['user_id'], log['field_id'], log['template_id'], 1 if log['success'] else -1)
+
+    def _load_existing_logs(self):
         try:
-            with open(path) as f:
-                return json.load(f)
+            with REGISTRY.timer("log_load"):
+                entries = self._resume_from_checkpoint()
+                with REGISTRY.timer("log_replay"):
+                    # Older entries carrying field names and question text are translated to IDs
+                    for log in entries if entries is not None else self.log_store:
+                        self._replay(self.catalog.compact_log(log))
+            if self.catalog.changed and self.catalog_path:
+                if self.catalog_read_only:
+                    print(f"Warning: {self.log_store.directory} has entries not in {self.catalog_path}; "
+                          "their IDs are not saved")
+                else:
+                    self.catalog.save(self.catalog_path)
+            if self.log_count > self.checkpoint_offset:
+                self.save_checkpoint()
         except Exception as e:
-            print(f"Warning: Could not load template bank from {path}: {e}")
-            return {}
-
-    def _load_valid_users(self, path):
+            print(f"Warning: Could not load logs from {self.log_store.directory}: {e}")
+
+    def iter_logs(self, limit=None):
+        """The first `limit` logs (all by default), streamed from the log store in compact form."""
+        logs = self.log_store if limit is None else itertools.islice(self.log_store, limit)
+        return (self.catalog.compact_log(log) for log in logs)
+
+    def save_checkpoint(self, background=False):
+        """
+        Checkpoint the RL state. With `background` only the snapshot is taken
+        here and the file is pickled and fsynced on another thread; a call
+        while that write is still running is skipped.
+        """
+        writer = self._checkpoint_writer
+        if writer is not None and writer.is_alive():
+            if background:
+                return
+            writer.join()
         try:
-            with open(path) as f:
-                users = json.load(f)
-                if isinstance(users, list):
-                    self.valid_users = {str(user['Employee ID']) for user in users if 'Employee ID' in user}
+            with REGISTRY.timer("checkpoint_snapshot"):
+                log_count, position = self.log_count, self.log_store.position()
+                state = self.rl_selector.snapshot(log_count, position)
         except Exception as e:
-            print(f"Warning: Could not load valid users from {path}: {e}")
-
-    def _load_existing_logs(self, path):
-        if Path(path).exists():
-            try:
-                with open(path) as f:
-                    self.logs = json.load(f)
-                    for log in self.logs:
-                        reward = 1 if log['success'] else -1
-                        self.rl_selector.update_q(log['user_id'], log['field'], log['template'], reward)
-            except Exception as e:
-                print(f"Warning: Could not load logs from {path}: {e}")
-
-    def _load_cleaned_data(self, path):
+            print(f"Warning: Could not save RL checkpoint to {self.checkpoint_dir}: {e}")
+            return
+        self.checkpoint_offset = log_count
+        if background:
+            self._checkpoint_writer = threading.Thread(target=self._write_checkpoint, args=(self.rl_selector, state),
+                                                       name="rl-checkpoint", daemon=True)
+            self._checkpoint_writer.start()
+        else:
+            self._write_checkpoint(self.rl_selector, state)
+
+    @timed("checkpoint_save")
+    def _write_checkpoint(self, rl_selector, state):
         try:
-            with open(path) as f:
-                records = json.load(f)
-                for record in records:
-                    user_id = str(record.get('Employee ID'))
-                    self.cleaned_data[user_id] = {
-                        k: [str(v)] if not isinstance(v, list) else [str(i) for i in v]
-                        for k, v in record.items() if k != 'Employee ID'
-                    }
+            rl_selector.write_checkpoint(self.checkpoint_dir, state)
         except Exception as e:
-            print(f"Warning: Could not load cleaned data from {path}: {e}")
+            print(f"Warning: Could not save RL checkpoint to {self.checkpoint_dir}: {e}")
 
-    def generate_small_logs(self, input_json_path, output_log_path, desired_log_count):
+    def generate_small_logs(self, desired_log_count):
+        # Only seed an empty log store; never clobber real history
+        if desired_log_count <= 0 or not self.log_store.is_empty():
+            return
         try:
-            with open(input_json_path) as f:
-                records = json.load(f)
-
-            logs = []
-            random.seed(42)
-            valid_logs = 0
+            from log_simulator import LogSimulator, dataset_user_ids
 
-            for user_record in records:
-                if valid_logs >= desired_log_count:
-                    break
+            simulator = LogSimulator(dataset_user_ids(self.dataset), self.catalog, seed=42)
 
-                user_id = str(user_record.get('Employee ID', 'unknown'))
+            def replay(logs):
+                for log in logs:
+                    self._replay(log)
 
-                fields = [
-                    f for f in user_record
-                    if f != 'Employee ID' and str(user_record[f]).strip() != "NA"
-                ]
-                if not fields:
-                    continue
-
-                field = random.choice(fields)
-                correct_answer = str(user_record[field])
-                template = f"Q-{field}-T{random.randint(1, 5)}"
-                user_answer = correct_answer if random.random() < 0.8 else "invalid response"
-                success = int(user_answer == correct_answer)
-
-                logs.append({
-                    "user_id": user_id,
-                    "field": field,
-                    "template": template,
-                    "user_answer": user_answer,
-                    "correct_answers": [correct_answer],
-                    "success": success
-                })
-
-                valid_logs += 1
-
-            with open(output_log_path, "w") as f:
-                json.dump(logs, f, indent=2)
-
-            print(f"Generated {len(logs)} logs and saved to {output_log_path}")
+            simulator.write(self.log_store, desired_log_count, on_chunk=replay)
+            print(f"Generated {desired_log_count} logs and saved to {self.log_store.directory}")
 
         except Exception as e:
             print(f"Error generating simulated logs: {e}")
 
+    @timed("validate_answer")
     def validate_answer(self, user_id, field, user_answer):
-        if len(self.logs) < 5:
-            user_data = self.cleaned_data.get(user_id, {})
-            return user_answer.lower() in [a.lower() for a in user_data.get(field, [])]
+        # Until a model has been fitted, check against the dataset directly
+        if self.log_count < 5 or self.model_version == 0:
+            return self.dataset.answer_matches(user_id, field, user_answer)
 
+        model = self._serving_model()  # keep serving this one even if a swap happens mid-call
+        if model is None:
+            return self.dataset.answer_matches(user_id, field, user_answer)
         try:
-            X = [[int(user_id), hash(field) % 1000]]
-            prediction = self.field_model.predict(X)[0]
+            X = [self.encoder.encode(user_id, self._field_key(field))]
+            prediction = model.predict(X)[0]
             return bool(prediction)
         except Exception as e:
             print(f"ML validation error: {e}")
             return False
 
+    @timed("validate_answers_batch")
+    def validate_answers_batch(self, rows):
+        """
+        Score many (user_id, field, user_answer) rows with one predict call.
+        Returns a list of bools in the same order; rows that can't be encoded
+        come back False, like validate_answer.
+        """
+        rows = list(rows)
+        if not rows:
+            return []
+        if self.log_count < 5 or self.model_version == 0:
+            return [self.validate_answer(u, f, a) for u, f, a in rows]
+
+        import numpy as np
+
+        model = self._serving_model()
+        if model is None:
+            return [self.validate_answer(u, f, a) for u, f, a in rows]
+        results = np.zeros(len(rows), dtype=bool)
+        try:
+            X, ok = self.encoder.encode_batch([r[0] for r in rows], [self._field_key(r[1]) for r in rows])
+            if len(X):
+                results[ok] = model.predict(X).astype(bool)
+        except Exception as e:
+            print(f"ML validation error: {e}")
+        return results.tolist()
+
+    def _field_key(self, field):
+        # Catalog IDs double as the model's field codes
+        field_id = self.catalog.field_id(field)
+        return field if field_id is None else field_id
+
     def log_interaction(self, user_id, field, template, user_answer, correct_answers):
+        """
+        Log one answer. `template` may be a catalog ID or the question text;
+        the entry stores IDs only (correct answers stay in the dataset).
+        """
         success = self.validate_answer(user_id, field, user_answer)
+        field_id, template_id = self._ids(field, template)
 
         log = {
             "user_id": user_id,
-            "field": field,
-            "template": template,
+            "field_id": field_id,
+            "template_id": template_id,
             "user_answer": user_answer,
-            "correct_answers": correct_answers,
-            "success": success
+            "success": int(success),
+            "ts": round(time.time(), 3)
         }
-        self.logs.append(log)
 
         reward = 1 if success else -1
-        self.rl_selector.update_q(user_id, field, template, reward)
-
-        if len(self.logs) % 5 == 0:
-            self.train_supervised()
-
-        with open("logs.json", "w") as f:
-            json.dump(self.logs, f, indent=2)
-
-    def train_supervised(self):
-        if len(self.logs) < 5:
+        self.rl_selector.update_q(user_id, field_id, template_id, reward)
+
+        with REGISTRY.timer("log_persistence"):
+            self.log_store.append(log)
+        # Counted once it is in the log store, where the trainer reads it back
+        self.recent_logs.append(log)
+        self.log_count += 1
+        REGISTRY.inc("interactions")
+        if success:
+            REGISTRY.inc("interactions_successful")
+        self.trainer.notify()
+
+        if self.log_count - self.checkpoint_offset >= self.checkpoint_every:
+            # Pickling the whole Q-table takes seconds at scale; keep it off the request path
+            self.save_checkpoint(background=True)
+
+    @timed("model_fit")
+    def fit_field_model(self, logs):
+        """Fit a fresh answer model on `logs`; returns None if there is nothing to fit."""
+        X, y = [], []
+        for log in logs:
+            try:
+                X.append(self.encoder.encode(log['user_id'], log['field_id']))
+                y.append(log['success'])
+            except:
+                continue
+        if not X:
+            return None
+        import numpy as np
+        from sklearn.ensemble import RandomForestClassifier
+
+        model = RandomForestClassifier()
+        model.fit(np.array(X), np.array(y))
+        return model
+
+    def swap_field_model(self, model, log_count, fingerprint=None, success_rate=None):
+        with self._model_lock:
+            self.field_model = model
+            self._pending_artifact = None
+            self.model_log_count = log_count
+            self.model_fingerprint = fingerprint
+            self.model_success_rate = success_rate
+            self.model_version += 1
+
+    def _serving_model(self):
+        """The current model, unpickling a deferred artifact on first use."""
+        if self._pending_artifact is None:
+            return self.field_model
+        with self._model_lock:
+            path = self._pending_artifact
+            if path is not None:
+                try:
+                    with REGISTRY.timer("model_artifact_load"):
+                        self.field_model = self.model_store.load(path)
+                except Exception as e:
+                    print(f"Warning: Could not load model artifact {path}: {e}")
+                    # Fall back to the dataset until the trainer fits a new model
+                    self.model_version = 0
+                    self.trainer.adopt(0)
+                    self.trainer.notify()
+                self._pending_artifact = None
+            return self.field_model
+
+    def _use_model_artifact(self):
+        """Serve a saved model trained on (a prefix of) the current logs, if any."""
+        if self.model_store is None:
             return False
+        log_count = self.log_count
+        with REGISTRY.timer("model_artifact_lookup"):
+            found = self.model_store.find(self.iter_logs(log_count), log_count)
+        if found is None:
+            return False
+        path, meta = found
+        with self._model_lock:
+            self._pending_artifact = path
+            self.model_log_count = meta["log_count"]
+            self.model_fingerprint = meta["fingerprint"]
+            self.model_success_rate = meta.get("success_rate")
+            self.model_version += 1
+        self.trainer.adopt(meta["log_count"], meta.get("success_rate"))
+        # Newer logs than the artifact covers are picked up in the background
+        self.trainer.notify()
+        # Unpickle (and import sklearn) off the startup path; a validation
+        # arriving first simply waits for it
+        threading.Thread(target=self._serving_model, name="model-loader", daemon=True).start()
+        return True
+
+    def save_model_artifact(self):
+        """Save the serving model keyed by the logs it was trained on."""
+        if self.model_store is None or self.model_version == 0 or self._pending_artifact is not None:
+            return None
+        with self._model_lock:
+            model, log_count = self.field_model, self.model_log_count
+            fingerprint, success_rate = self.model_fingerprint, self.model_success_rate
+        if fingerprint is None:
+            return None
         try:
-            X, y = [], []
-            for log in self.logs:
-                try:
-                    uid = int(log['user_id'])
-                    fid = hash(log['field']) % 1000
-                    X.append([uid, fid])
-                    y.append(log['success'])
-                except:
-                    continue
-            if X and y:
-                self.field_model.fit(np.array(X), np.array(y))
-                print("ML model trained on", len(X), "examples")
-                return True
-            else:
-                print("No data to train ML model.")
-                return False
+            if self.model_store.exists(fingerprint, log_count):
+                return None
+            return self.model_store.save(model, fingerprint, log_count, success_rate)
         except Exception as e:
-            print(f"Training error: {e}")
+            print(f"Warning: Could not save model artifact to {self.model_store.directory}: {e}")
+            return None
+
+    @timed("train_supervised")
+    def train_supervised(self):
+        """
+        Load or fit the answer model synchronously. Both read the whole log
+        from disk; servers use `train_supervised_in_background` instead.
+        """
+        if self.log_count < 5:
             return False
+        # Keep the background trainer from refitting the logs an artifact may cover
+        with self.trainer.lock:
+            if self._use_model_artifact():
+                print("ML model loaded from artifact trained on", self.model_log_count, "examples")
+                return True
+            if self.trainer.train_now():
+                print("ML model trained on", self.trainer.trained_log_count, "examples")
+                self.save_model_artifact()
+                return True
+        print("No data to train ML model.")
+        return False
+
+    def train_supervised_in_background(self):
+        """
+        Run `train_supervised` on a thread so startup doesn't wait for a pass
+        over the full history; answers are checked against the dataset
+        until a model is in place.
+        """
+        thread = threading.Thread(target=self.train_supervised, name="model-loader", daemon=True)
+        thread.start()
+        return thread
 
     def select_top_3_questions_for_random_field(self, user_id):
         if not self.is_valid_user(user_id):
             raise ValueError(f"Invalid user ID: {user_id}")
 
-        if not self.template_bank:
+        field_ids = [f for f in range(len(self.catalog.fields)) if self.catalog.templates_for(f)]
+        if not field_ids:
             raise ValueError("Template bank is empty or not loaded.")
 
-        selected_field = random.choice(list(self.template_bank.keys()))
-        templates_for_field = self.template_bank[selected_field]
-        candidates = [(selected_field, t) for t in templates_for_field]
+        field_id = random.choice(field_ids)
+        candidates = [(field_id, t) for t in self.catalog.templates_for(field_id)]
         top_templates = self.rl_selector.select_best(user_id, candidates, k=3)
-        return selected_field, [t for _, t in top_templates]
+        return self.catalog.field_name(field_id), [self.catalog.template_text(t) for _, t in top_templates]
+
+    def select_best_batch(self, user_ids, field, k=3):
+        """Top-k template IDs for `field` for every user in one pass (see RLSelector.select_best_batch)."""
+        field_id = self.catalog.field_id(field)
+        return self.rl_selector.select_best_batch(user_ids, field_id, self.catalog.templates_for(field_id), k=k)
 
     def is_valid_user(self, user_id):
-        return str(user_id) in self.valid_users
+        return self.dataset.is_valid_user(user_id)
 
 
 # Usage example:
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import struct
+import time
+
+ARTIFACT_MAGIC = b"MODELART"
+ARTIFACT_VERSION = 1
+# Bump when FeatureEncoder output changes so older artifacts stop matching
+FEATURE_VERSION = 1
+ARTIFACT_PATTERN = re.compile(r"model-(\d+)-([0-9a-f]{16})\.pkl$")
+
+
+class LogsFingerprint:
+    """
+    sha256 over exactly what the answer model is trained on, fed one log
+    at a time so it can be taken while streaming the log from disk.
+    `hexdigest()` may be read at any point and covers the logs so far.
+    """
+
+    def __init__(self):
+        self._digest = hashlib.sha256(f"features-v{FEATURE_VERSION}\n".encode())
+        self.count = 0
+        self.successes = 0
+
+    def update(self, log):
+        success = int(bool(log['success']))
+        if self.count:
+            self._digest.update(b"\n")
+        self._digest.update(f"{log['user_id']},{log['field_id']},{success}".encode("utf-8"))
+        self.count += 1
+        self.successes += success
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+def _sklearn_version():
+    import sklearn
+    return sklearn.__version__
+
+
+class ModelArtifactStore:
+    """
+    Trained answer models saved as versioned files keyed by the fingerprint
+    of their training logs, so a restart over the same logs can load the
+    model instead of refitting it.
+
+    Each file is `model-<log_count>-<fingerprint>.pkl`: a magic, a JSON
+    metadata header (format version, fingerprint, log count, success rate
+    of those logs, sklearn version) and the pickled model. Metadata is readable without unpickling.
+    """
+
+    def __init__(self, directory="models", keep=3):
+        self.directory = directory
+        self.keep = keep
+
+    def _path(self, log_count, fingerprint):
+        return os.path.join(self.directory, f"model-{log_count:012d}-{fingerprint[:16]}.pkl")
+
+    def artifacts(self):
+        """[(log_count, path)] oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            match = ARTIFACT_PATTERN.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def exists(self, fingerprint, log_count):
+        return os.path.exists(self._path(log_count, fingerprint))
+
+    def save(self, model, fingerprint, log_count, success_rate=None):
+        os.makedirs(self.directory, exist_ok=True)
+        meta = json.dumps({
+            "version": ARTIFACT_VERSION,
+            "fingerprint": fingerprint,
+            "log_count": log_count,
+            "success_rate": success_rate,
+            "sklearn": _sklearn_version(),
+            "created": time.time(),
+        }).encode("utf-8")
+        path = self._path(log_count, fingerprint)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(ARTIFACT_MAGIC + struct.pack("<I", len(meta)) + meta)
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        for _, old in self.artifacts()[:-self.keep]:
+            os.remove(old)
+        return path
+
+    def read_meta(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(ARTIFACT_MAGIC)) != ARTIFACT_MAGIC:
+                raise ValueError(f"{path} is not a model artifact")
+            (size,) = struct.unpack("<I", f.read(4))
+            return json.loads(f.read(size))
+
+    def load(self, path):
+        """Unpickle the model; imports sklearn, so callers defer this until needed."""
+        with open(path, "rb") as f:
+            f.seek(len(ARTIFACT_MAGIC))
+            (size,) = struct.unpack("<I", f.read(4))
+            meta = json.loads(f.read(size))
+            if meta.get("sklearn") != _sklearn_version():
+                raise ValueError(f"{path} was saved with scikit-learn {meta.get('sklearn')}")
+            return pickle.load(f)
+
+    def find(self, logs, log_count):
+        """
+        Newest artifact trained on a prefix of `logs` (an iterable of
+        `log_count` entries), as (path, meta), or None. `logs` is read once,
+        only as far as the largest candidate; nothing is unpickled.
+        """
+        candidates = {}
+        for count, path in self.artifacts():
+            if count > log_count:
+                continue
+            try:
+                meta = self.read_meta(path)
+            except Exception as e:
+                print(f"Warning: Could not read model artifact {path}: {e}")
+                continue
+            if meta.get("version") == ARTIFACT_VERSION:
+                candidates.setdefault(count, []).append((path, meta))
+        if not candidates:
+            return None
+
+        found = None
+        fingerprint = LogsFingerprint()
+        logs = iter(logs)
+        for count in sorted(candidates):
+            while fingerprint.count < count:
+                log = next(logs, None)
+                if log is None:
+                    return found
+                fingerprint.update(log)
+            digest = fingerprint.hexdigest()
+            for path, meta in candidates[count]:
+                if meta.get("fingerprint") == digest:
+                    found = path, meta
+        return found
@@ -0,0 +1,142 @@
+import itertools
+import threading
+import time
+
+from metrics import REGISTRY
+from model_artifacts import LogsFingerprint
+
+
+class BackgroundTrainer:
+    """
+    Retrains the selector's answer model on a background thread.
+
+    A retrain is triggered by whichever of these fires first:
+      - `every_n_logs` new logs since the last training
+      - `interval` seconds since the last training (if there are new logs)
+      - the success rate of the last `drift_window` logs moving more than
+        `drift_threshold` away from the rate the current model was trained on
+
+    The selector keeps serving its current model until the new one is fitted,
+    then swaps it in atomically. Training streams the logs from the
+    selector's log store; only the last `drift_window` logs are checked for
+    drift, from the selector's in-memory window of recent logs.
+    """
+
+    def __init__(self, selector, every_n_logs=5, interval=None, drift_threshold=None, drift_window=200):
+        self.selector = selector
+        self.every_n_logs = every_n_logs
+        self.interval = interval
+        self.drift_threshold = drift_threshold
+        self.drift_window = drift_window
+
+        self.trainings = 0
+        self.failures = 0
+        self.last_duration = None
+        self.total_duration = 0.0
+        self.trained_log_count = 0
+        self.trained_success_rate = None
+        self.trained_at = None
+
+        # Held while fitting; holding it keeps the background thread from starting a fit
+        self.lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Staleness of the serving model; also reported under "trainer" in /health
+        REGISTRY.gauge("model_age_seconds", lambda: time.time() - self.trained_at)
+        REGISTRY.gauge("logs_since_training", lambda: self.selector.log_count - self.trained_log_count)
+        REGISTRY.gauge("last_training_seconds", lambda: self.last_duration)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-trainer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _drifted(self):
+        if self.drift_threshold is None or self.trained_success_rate is None:
+            return False
+        recent = list(itertools.islice(reversed(self.selector.recent_logs), self.drift_window))
+        if len(recent) < self.drift_window:
+            return False
+        rate = sum(1 for log in recent if log['success']) / len(recent)
+        return abs(rate - self.trained_success_rate) > self.drift_threshold
+
+    def notify(self):
+        """Called after every logged interaction; cheap unless a trigger fires."""
+        pending = self.selector.log_count - self.trained_log_count
+        if pending <= 0:
+            return
+        if (self.every_n_logs and pending >= self.every_n_logs) or self._drifted():
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            fired = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if fired or self.selector.log_count > self.trained_log_count:
+                with self.lock:
+                    # The model may have been brought up to date meanwhile, e.g.
+                    # loaded from an artifact at startup
+                    if self.selector.log_count > self.trained_log_count:
+                        self._train(self.selector.log_count)
+
+    def train_now(self):
+        """Fit on the logs written so far and swap the model in."""
+        with self.lock:
+            return self._train(self.selector.log_count)
+
+    def _train(self, log_count):
+        if log_count < 5:
+            return False
+        start = time.perf_counter()
+        # Fingerprinted in the same pass, so the model can be saved without rereading its logs
+        fingerprint = LogsFingerprint()
+
+        def logs():
+            for log in self.selector.iter_logs(log_count):
+                fingerprint.update(log)
+                yield log
+
+        try:
+            model = self.selector.fit_field_model(logs())
+        except Exception as e:
+            self.failures += 1
+            print(f"Background training error: {e}")
+            return False
+        if model is None:
+            return False
+
+        success_rate = fingerprint.successes / fingerprint.count
+        self.selector.swap_field_model(model, fingerprint.count, fingerprint.hexdigest(), success_rate)
+        self.last_duration = time.perf_counter() - start
+        self.total_duration += self.last_duration
+        self.trainings += 1
+        self.adopt(fingerprint.count, success_rate)
+        return True
+
+    def adopt(self, log_count, success_rate=None):
+        """Record that the serving model covers the first `log_count` logs, e.g. one loaded from an artifact."""
+        self.trained_log_count = log_count
+        self.trained_success_rate = success_rate
+        self.trained_at = time.time()
+
+    def metrics(self):
+        return {
+            "trainings": self.trainings,
+            "failures": self.failures,
+            "last_training_seconds": self.last_duration,
+            "mean_training_seconds": self.total_duration / self.trainings if self.trainings else None,
+            "model_age_seconds": time.time() - self.trained_at if self.trained_at else None,
+            "logs_since_training": self.selector.log_count - self.trained_log_count,
+        }
@@ -1,57 +1,66 @@
 import random
-import json
-import os
-from collections import defaultdict, deque
+from field_history import FieldHistoryStore
+from metrics import timed
+from session_state import BoundedState
+
+RECENT_FIELDS = 3
 
 class QuestionAsker:
-    def __init__(self, selector, log_path="logs.json", history_path="question_history.json"):
+    def __init__(self, selector, dataset=None, history_path="question_history.db",
+                 legacy_history_path="question_history.json", history_flush_interval=1.0,
+                 session_max_users=100_000, session_ttl=None):
         self.selector = selector
-        self.cache = {}  # Cache templates per field
-        self.log_path = log_path
-        self.history_path = history_path
+        self.dataset = dataset if dataset is not None else selector.dataset
+        self.catalog = selector.catalog
+        # Per-user session memory; least recently seen users are evicted past
+        # `session_max_users`, idle ones after `session_ttl` seconds
+        self.session_max_users = session_max_users
+        self.session_ttl = session_ttl
         self.asked_fields_by_user = self._load_user_history()
-        self.recent_session_fields = defaultdict(lambda: deque(maxlen=3))  # session memory
-        self.field_history = self._load_field_history()  # Persistent field-level history
+        self.recent_session_fields = BoundedState(session_max_users, session_ttl)  # user -> (field, ...)
+        # Persistent field-level history, read and written one user at a time
+        self.field_history = FieldHistoryStore(history_path, flush_interval=history_flush_interval,
+                                               legacy_json=legacy_history_path)
 
     def _load_user_history(self):
         """
-        Load persistent user-question logs to avoid long-term repetition.
+        Seed per-user asked fields from the selector's recent interaction
+        logs. Long-term repetition is prevented by `field_history`; walking
+        the full log here would make startup scale with all history.
         """
-        asked = {}
-        if os.path.exists(self.log_path):
-            try:
-                with open(self.log_path, 'r') as f:
-                    logs = json.load(f)
-                for entry in logs:
-                    uid = entry['user_id']
-                    field = entry['field']
-                    if uid not in asked:
-                        asked[uid] = set()
-                    asked[uid].add(field)
-            except Exception as e:
-                print(f"Warning: Failed to load logs.json for history tracking: {e}")
+        asked = BoundedState(self.session_max_users, self.session_ttl)
+        try:
+            for entry in self.selector.recent_logs:
+                uid = entry['user_id']
+                field = self.catalog.field_name(entry['field_id'])
+                fields = asked.get(uid)
+                if fields is None:
+                    asked.set(uid, {field})
+                else:
+                    fields.add(field)
+        except Exception as e:
+            print(f"Warning: Failed to load interaction logs for history tracking: {e}")
         return asked
 
-    def _load_field_history(self):
-        if os.path.exists(self.history_path):
-            try:
-                with open(self.history_path, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Warning: Failed to load {self.history_path}: {e}")
-        return {}
+    def evict_expired(self):
+        """Drop per-user session state idle past its TTL; servers call this periodically."""
+        self.recent_session_fields.evict_expired()
+        self.asked_fields_by_user.evict_expired()
+        self.selector.rl_selector.recent_templates.evict_expired()
 
-    def _save_field_history(self):
-        try:
-            with open(self.history_path, 'w') as f:
-                json.dump(self.field_history, f, indent=2)
-        except Exception as e:
-            print(f"Warning: Failed to save field history: {e}")
+    def close(self):
+        """Write any buffered field history."""
+        self.field_history.close()
 
-    def ask_questions(self, user_id, record, num_questions=3):
+    @timed("ask_questions")
+    def ask_questions(self, user_id, record=None, num_questions=3):
         """
         Ask up to `num_questions` from distinct fields randomly selected and not recently used.
+        The record is looked up in the shared dataset when not given.
         """
+        if record is None:
+            record = self.dataset.get(user_id) or {}
+
         # Step 1: Find eligible fields (excluding ID/Name, and ignoring "NA" values)
         populated_fields = [
             f for f in record
@@ -62,34 +71,27 @@ class QuestionAsker:
         if not populated_fields:
             return []
 
-        # Step 2: Load templates if not cached
-        if not self.cache:
-            try:
-                self.cache = self.selector._load_template_bank("/Users/jaiharishsatheshkumar/synthetic_data_generator/.venv/bin/template_bank.json")
-            except Exception as e:
-                print(f"Warning: Could not load template bank: {e}")
-                return []
-
-        # Step 3: Keep only fields with templates
-        valid_fields = [f for f in populated_fields if f in self.cache and self.cache[f]]
+        # Step 2-3: Keep only fields with templates in the catalog
+        valid_fields = [f for f in populated_fields if self.catalog.templates_for(f)]
         if not valid_fields:
             return []
 
         # Step 4: Remove recently used fields from this session
-        recent_fields = self.recent_session_fields[user_id]
+        recent_fields = self.recent_session_fields.get(user_id, ())
         candidate_fields = [f for f in valid_fields if f not in recent_fields]
 
         if not candidate_fields:
-            self.recent_session_fields[user_id].clear()
+            recent_fields = ()
             candidate_fields = valid_fields
 
         # Step 5: Remove persistently asked fields from field history
-        previously_asked = set(self.field_history.get(user_id, []))
+        user_history = self.field_history.get(user_id)
+        previously_asked = set(user_history)
         remaining_fields = [f for f in candidate_fields if f not in previously_asked]
 
         # If all fields already asked, reset persistent history for this user
         if not remaining_fields:
-            self.field_history[user_id] = []
+            user_history = []
             remaining_fields = candidate_fields
 
         # Step 6: Shuffle and pick up to `num_questions` unique fields
@@ -99,43 +101,51 @@ class QuestionAsker:
         questions = []
 
         for field in selected_fields:
-            templates = self.cache.get(field, [])
-            if not templates:
-                continue
-            candidates = [(field, t) for t in templates]
+            field_id = self.catalog.field_id(field)
+            candidates = [(field_id, t) for t in self.catalog.templates_for(field_id)]
             best = self.selector.rl_selector.select_best(user_id, candidates, k=1)
             if best:
-                selected_field, template = best[0]
-                question_text = template.replace("{value}", str(record.get(selected_field, "")))
-                questions.append((selected_field, template, question_text))
-                self.recent_session_fields[user_id].append(field)
-
-        # Step 7: Update persistent field history and save
-        if user_id not in self.field_history:
-            self.field_history[user_id] = []
+                _, template_id = best[0]
+                # Text is only produced here, for display
+                question_text = self.catalog.render(template_id, record.get(field, ""))
+                questions.append((field, template_id, question_text))
+                recent_fields = recent_fields[-(RECENT_FIELDS - 1):] + (field,)
+        self.recent_session_fields.set(user_id, recent_fields)
+
+        # Step 7: Update persistent field history (buffered, see FieldHistoryStore)
         for field in selected_fields:
-            if field not in self.field_history[user_id]:
-                self.field_history[user_id].append(field)
-        self._save_field_history()
+            if field not in user_history:
+                user_history.append(field)
+        self.field_history.set(user_id, user_history)
 
         return questions
 
-    def record_user_answer(self, user_id, field, template, user_answer, correct_answers):
+    @timed("record_user_answer")
+    def record_user_answer(self, user_id, field, template, user_answer, correct_answers=None):
         """
         Record user's answer, update RL scores, and avoid asking same field again.
+        Returns whether the answer was correct.
         """
-        if isinstance(correct_answers, str):
-            correct_answers = [correct_answers]
-
-        correct_answers = [ans.lower().strip() for ans in correct_answers]
-        success = int(user_answer.lower().strip() in correct_answers)
+        success = self.dataset.answer_matches(user_id, field, user_answer, correct_answers)
         reward = 1 if success else -1
 
-        # Update logs and Q-values
+        # Update logs and Q-values (keyed by catalog IDs)
         self.selector.log_interaction(user_id, field, template, user_answer, correct_answers)
-        self.selector.rl_selector.update_q(user_id, field, template, reward)
+        field_id, template_id = self.selector._ids(field, template)
+        self.selector.rl_selector.update_q(user_id, field_id, template_id, reward)
 
         # Track this field in permanent history (log-based only)
-        if user_id not in self.asked_fields_by_user:
-            self.asked_fields_by_user[user_id] = set()
-        self.asked_fields_by_user[user_id].add(field)
+        fields = self.asked_fields_by_user.get(user_id)
+        if fields is None:
+            self.asked_fields_by_user.set(user_id, {field})
+        else:
+            fields.add(field)
+        return success
+
+    def state_metrics(self):
+        """Live and evicted entry counts for the per-user session state."""
+        return {
+            "recent_session_fields": self.recent_session_fields.metrics(),
+            "asked_fields_by_user": self.asked_fields_by_user.metrics(),
+            "recent_templates": self.selector.rl_selector.recent_templates.metrics(),
+        }
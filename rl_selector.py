@@ -1,48 +1,308 @@
-from collections import defaultdict, deque
+import os
+import pickle
+import re
+from collections import defaultdict
+
+from metrics import timed
+from session_state import BoundedState
+
+CHECKPOINT_MAGIC = b"RLCKPT"
+CHECKPOINT_VERSION = 3
+# Version 2 checkpoints have no log position; they load, but the whole log is replayed
+READABLE_CHECKPOINT_VERSIONS = (2, CHECKPOINT_VERSION)
+CHECKPOINT_PATTERN = re.compile(r"rl-(\d+)\.ckpt$")
+RECENT_TEMPLATES = 3
 
 class RLSelector:
-    def __init__(self):
-        # Q-table stores Q-values for (user_id, field, template)
-        self.q_table = defaultdict(float)
-        # Keep track of recently used templates per (user_id, field)
-        self.recent_templates = defaultdict(lambda: deque(maxlen=3))
+    def __init__(self, recent_max_entries=200_000, recent_ttl=None):
+        # Q-table stores Q-values grouped by (user_id, field_id): {template_id: q}.
+        # This is learned state, not session state: it grows with every
+        # (user, field) ever answered and is never evicted
+        self.q_table = defaultdict(dict)
+        # Highest Q-value per (user_id, field), maintained on every update
+        self.max_q = {}
+        # Keep track of recently used templates per (user_id, field) as short
+        # tuples; idle entries are evicted (LRU / TTL) so memory stays bounded
+        self.recent_templates = BoundedState(recent_max_entries, recent_ttl, on_evict=self._on_recent_evicted)
+        # Dense copy for select_best_batch, built on first use (see _DenseQ)
+        self._dense = None
+        # Set while a snapshot taken by `snapshot` may still be written out;
+        # updates then copy their group instead of changing the shared one
+        self._groups_shared = False
 
+    def get_q(self, user_id, field, template):
+        group = self.q_table.get((user_id, field))
+        return group.get(template, 0.0) if group else 0.0
+
+    @timed("rl_update_q")
     def update_q(self, user_id, field, template, reward):
-        key = (user_id, field, template)
-        current_q = self.q_table.get(key, 0.0)
+        key = (user_id, field)
+        group = self.q_table[key]
+        if self._groups_shared:
+            group = self.q_table[key] = dict(group)
+        current_q = group.get(template, 0.0)
         learning_rate = 0.1
         discount_factor = 0.9
         # Q-learning update rule
         new_q = current_q + learning_rate * (
             reward + discount_factor * self._max_future_q(user_id, field) - current_q
         )
-        self.q_table[key] = new_q
-        self.recent_templates[(user_id, field)].append(template)
+        group[template] = new_q
+
+        best = self.max_q.get(key)
+        if best is None or new_q >= best:
+            self.max_q[key] = new_q
+        elif current_q == best:
+            # The previous best may have just dropped; rescan this field only
+            self.max_q[key] = max(group.values())
+        recent = self.recent_templates.get(key, ())
+        evicted = recent[0] if len(recent) == RECENT_TEMPLATES else None
+        recent = recent[-(RECENT_TEMPLATES - 1):] + (template,)
+        self.recent_templates.set(key, recent)
+        if self._dense is not None:
+            self._dense.update(user_id, field, template, new_q, evicted, recent)
+
+    def _clear_recent(self, user_id, field):
+        self.recent_templates.pop((user_id, field))
+        if self._dense is not None:
+            self._dense.clear_recent(user_id, field)
+
+    def _on_recent_evicted(self, key, _):
+        if self._dense is not None:
+            self._dense.clear_recent(*key)
 
     def _max_future_q(self, user_id, field):
-        keys = [k for k in self.q_table if k[0] == user_id and k[1] == field]
-        if not keys:
-            return 0.0
-        return max(self.q_table[k] for k in keys)
+        return self.max_q.get((user_id, field), 0.0)
 
+    @timed("rl_select_best")
     def select_best(self, user_id, candidates, k=3):
         filtered_candidates = []
         # Avoid recently used templates for user-field
         for field, template in candidates:
-            recent_for_field = self.recent_templates.get((user_id, field), deque())
+            recent_for_field = self.recent_templates.get((user_id, field), ())
             if template not in recent_for_field:
                 filtered_candidates.append((field, template))
 
         if not filtered_candidates:
             # If all templates are exhausted, reset recent templates
             for field, _ in candidates:
-                self.recent_templates[(user_id, field)].clear()
+                self._clear_recent(user_id, field)
             filtered_candidates = candidates
 
         # Sort by highest Q-value to pick best templates
         filtered_candidates.sort(
-            key=lambda ft: self.q_table.get((user_id, ft[0], ft[1]), 0.0),
+            key=lambda ft: self.get_q(user_id, ft[0], ft[1]),
             reverse=True
         )
 
         return filtered_candidates[:k]
+
+    @timed("rl_select_best_batch")
+    def select_best_batch(self, user_ids, field, templates, k=3):
+        """
+        select_best for many users at once, all choosing among `templates`
+        of one field (catalog template IDs). Returns an (n_users, k) array
+        of template IDs in descending Q order; slots without an eligible
+        template hold -1.
+        """
+        import numpy as np
+
+        if self._dense is None:
+            self._dense = _DenseQ.from_selector(self)
+        dense = self._dense
+        templates = list(templates)
+        k = min(k, len(templates))
+        if not templates or k == 0 or len(user_ids) == 0:
+            return np.full((len(user_ids), k), -1)
+
+        rows = dense.rows_for(user_ids)
+        cols = np.array([dense.col(field, t) for t in templates])
+        q = dense.q[rows[:, None], cols]
+        recent = dense.recent[rows[:, None], cols]
+
+        # Users who have seen every template start over, as in select_best
+        exhausted = recent.all(axis=1)
+        for i in np.flatnonzero(exhausted):
+            self._clear_recent(user_ids[i], field)
+        recent[exhausted] = False
+
+        scores = np.where(recent, -np.inf, q)
+        # Stable sort keeps candidate order among equal Q-values, like list.sort
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        picked = np.asarray(templates)[order]
+        eligible = np.take_along_axis(scores, order, axis=1) > -np.inf
+        return np.where(eligible, picked, -1)
+
+    def save_checkpoint(self, directory, log_offset, log_position=None, keep=3):
+        """
+        Write the Q-values and recent templates as a versioned binary
+        checkpoint covering the first `log_offset` log entries, which end at
+        `log_position` in the log (see InteractionLog.position). Older
+        checkpoints beyond `keep` are removed.
+        """
+        return self.write_checkpoint(directory, self.snapshot(log_offset, log_position), keep)
+
+    def snapshot(self, log_offset, log_position=None):
+        """
+        Checkpoint state as of now, for `write_checkpoint`. Only the outer
+        tables are copied, so this is cheap enough for the request path;
+        updates copy a group before changing it until the write is done.
+        """
+        self._groups_shared = True
+        return {
+            "version": CHECKPOINT_VERSION,
+            "log_offset": log_offset,
+            "log_position": list(log_position) if log_position is not None else None,
+            "q_table": dict(self.q_table),
+            # max_q and the recent-template values are filled in by write_checkpoint
+            "recent_templates": self.recent_templates.snapshot(),
+        }
+
+    def write_checkpoint(self, directory, state, keep=3):
+        """Write a `snapshot`; safe to run on another thread while updates go on."""
+        try:
+            state = {**state,
+                     "max_q": {key: max(group.values()) for key, group in state["q_table"].items()},
+                     "recent_templates": BoundedState.snapshot_values(state["recent_templates"])}
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"rl-{state['log_offset']:012d}.ckpt")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(CHECKPOINT_MAGIC)
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            self._groups_shared = False
+        os.replace(tmp_path, path)
+
+        for _, old in list_checkpoints(directory)[:-keep]:
+            os.remove(old)
+        return path
+
+    @classmethod
+    def load_checkpoint(cls, path, **kwargs):
+        """
+        Returns (selector, log_offset, log_position) restored from a
+        checkpoint file; `kwargs` configure the new selector. The position
+        is None for checkpoints written without one.
+        """
+        with open(path, "rb") as f:
+            if f.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+                raise ValueError(f"{path} is not an RL checkpoint")
+            state = pickle.load(f)
+        if state.get("version") not in READABLE_CHECKPOINT_VERSIONS:
+            raise ValueError(f"{path} has checkpoint version {state.get('version')}, expected {CHECKPOINT_VERSION}")
+
+        selector = cls(**kwargs)
+        selector.q_table.update(state["q_table"])
+        selector.max_q = state["max_q"]
+        for key, templates in state["recent_templates"].items():
+            selector.recent_templates.set(key, tuple(templates))
+        position = state.get("log_position")
+        return selector, state["log_offset"], tuple(position) if position is not None else None
+
+
+def list_checkpoints(directory):
+    """[(log_offset, path)] for the checkpoints in `directory`, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in os.listdir(directory):
+        match = CHECKPOINT_PATTERN.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+class _DenseQ:
+    """
+    Q-values and recency as (user row, (field, template) column) matrices.
+
+    Row 0 is an all-zero row shared by users with no history, so scoring a
+    whole workforce does not allocate per-user rows. RLSelector keeps this
+    in step with every update once it exists.
+
+    Like the Q-table it mirrors, this is unbounded: there is a row for every
+    user with a Q-value, and rows are never freed. It costs 9 bytes per
+    (user, field template) cell, so about 0.8 MB per 1,000 users with 90
+    templates, and exists only once select_best_batch has been used.
+    """
+
+    def __init__(self):
+        # numpy is only imported once batch selection is first used
+        import numpy as np
+
+        self.rows = {}
+        self.cols = {}
+        self.field_cols = defaultdict(list)
+        self.q = np.zeros((1024, 16))
+        self.recent = np.zeros((1024, 16), dtype=bool)
+        self._next_row = 1
+
+    @classmethod
+    def from_selector(cls, selector):
+        dense = cls()
+        for (user_id, field), group in selector.q_table.items():
+            row = dense.row(user_id)
+            for template, q in group.items():
+                col = dense.col(field, template)
+                dense.q[row, col] = q
+        for (user_id, field), recent in selector.recent_templates.items():
+            if recent:
+                row = dense.row(user_id)
+                for template in recent:
+                    col = dense.col(field, template)
+                    dense.recent[row, col] = True
+        return dense
+
+    def _grow(self, n_rows, n_cols):
+        import numpy as np
+
+        rows, cols = self.q.shape
+        if n_rows <= rows and n_cols <= cols:
+            return
+        shape = (rows if n_rows <= rows else max(2 * rows, n_rows),
+                 cols if n_cols <= cols else max(2 * cols, n_cols))
+        q = np.zeros(shape)
+        recent = np.zeros(shape, dtype=bool)
+        q[:rows, :cols] = self.q
+        recent[:rows, :cols] = self.recent
+        self.q, self.recent = q, recent
+
+    def row(self, user_id):
+        row = self.rows.get(user_id)
+        if row is None:
+            row = self.rows[user_id] = self._next_row
+            self._next_row += 1
+            self._grow(row + 1, len(self.cols))
+        return row
+
+    def col(self, field, template):
+        col = self.cols.get((field, template))
+        if col is None:
+            col = self.cols[(field, template)] = len(self.cols)
+            self.field_cols[field].append(col)
+            self._grow(self._next_row, col + 1)
+        return col
+
+    def rows_for(self, user_ids):
+        import numpy as np
+
+        get = self.rows.get
+        return np.fromiter((get(u, 0) for u in user_ids), dtype=np.intp, count=len(user_ids))
+
+    def update(self, user_id, field, template, q, evicted, recent):
+        # Look up (and possibly grow) before indexing the arrays
+        row = self.row(user_id)
+        col = self.col(field, template)
+        self.q[row, col] = q
+        self.recent[row, col] = True
+        if evicted is not None and evicted not in recent:
+            evicted_col = self.col(field, evicted)
+            self.recent[row, evicted_col] = False
+
+    def clear_recent(self, user_id, field):
+        row = self.rows.get(user_id)
+        if row is not None:
+            self.recent[row, self.field_cols[field]] = False
@@ -0,0 +1,106 @@
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ("value", "touched")
+
+    def __init__(self, value, touched):
+        self.value = value
+        self.touched = touched
+
+
+class BoundedState:
+    """
+    Per-key session state with LRU and/or TTL eviction.
+
+    Keys are kept in least-recently-used order, so both limits are enforced
+    by popping from the front: at most `max_entries` keys are kept, and keys
+    not read or written for `ttl` seconds are dropped. Either limit may be
+    None. `on_evict(key, value)` is called for every evicted entry.
+
+    Values should be small immutable records (tuples rather than deques) so
+    that a live entry costs little more than its key.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, on_evict=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.clock = clock
+        self.evicted = 0
+        self.expired = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        now = self.clock()
+        if self.ttl is not None and now - entry.touched > self.ttl:
+            self._drop(key, expired=True)
+            return default
+        entry.touched = now
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key, value):
+        now = self.clock()
+        entry = self._entries.get(key)
+        # A new entry rather than an update in place, so a `snapshot` keeps the old value
+        self._entries[key] = _Entry(value, now)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        self._evict(now)
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry.value
+
+    def _drop(self, key, expired):
+        entry = self._entries.pop(key)
+        if expired:
+            self.expired += 1
+        else:
+            self.evicted += 1
+        if self.on_evict is not None:
+            self.on_evict(key, entry.value)
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            cutoff = now - self.ttl
+            while self._entries:
+                key, entry = next(iter(self._entries.items()))
+                if entry.touched >= cutoff:
+                    break
+                self._drop(key, expired=True)
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)), expired=False)
+
+    def evict_expired(self):
+        """Drop entries past their TTL without waiting for the next write."""
+        self._evict(self.clock())
+
+    def items(self):
+        return [(key, entry.value) for key, entry in self._entries.items()]
+
+    def snapshot(self):
+        """
+        Point-in-time copy that another thread can turn into {key: value}
+        with `snapshot_values`. Only references are copied, so it is cheap.
+        """
+        return dict(self._entries)
+
+    @staticmethod
+    def snapshot_values(snapshot):
+        return {key: entry.value for key, entry in snapshot.items()}
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def metrics(self):
+        return {"live": len(self._entries), "evicted": self.evicted, "expired": self.expired}
@@ -0,0 +1,125 @@
+import argparse
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from intial_50000_data import NameEngine, allocate_employee_ids
+from enrich_employee_data import enrich_columnar
+
+# Rows per shard. Shard boundaries depend only on this (never on the worker
+# count), which is what keeps the output identical for any number of workers.
+DEFAULT_SHARD_SIZE = 250_000
+
+
+def shard_rng(master_seed, shard_index):
+    """Independent generator for one shard, derived from the master seed."""
+    return np.random.default_rng(np.random.SeedSequence(master_seed, spawn_key=(shard_index,)))
+
+
+def _write_shard(task):
+    shard_index, master_seed, head, ids, name_codes, enrich, part_path = task
+    df = pd.DataFrame({"Employee Name": NameEngine().decode(name_codes), "Employee ID": ids})
+    if head is not None:
+        df = pd.concat([head, df], ignore_index=True)
+    if enrich:
+        df = enrich_columnar(df, seed=shard_rng(master_seed, shard_index))
+    df.to_csv(part_path, index=False, header=(shard_index == 0))
+    return part_path
+
+
+def _enrich_shard(task):
+    shard_index, master_seed, df, part_path = task
+    enrich_columnar(df, seed=shard_rng(master_seed, shard_index)).to_csv(
+        part_path, index=False, header=(shard_index == 0))
+    return part_path
+
+
+def _run_shards(fn, tasks, output_csv, workers):
+    if workers == 1:
+        parts = [fn(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(fn, tasks))
+
+    # Stitch the parts together in shard order
+    with open(output_csv, "wb") as out:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out)
+
+
+def _part_dir(output_csv):
+    return tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_csv)))
+
+
+def generate_sharded(total, output_csv, master_seed=0, workers=None, shard_size=DEFAULT_SHARD_SIZE,
+                     initial_csv="employees.csv", enrich=False, id_prefix="2000", id_width=6):
+    """
+    Generate `total` employees (including the ones in `initial_csv`) across a
+    process pool.
+
+    IDs and name codes are allocated up front in one vectorized pass, so
+    shards can never overlap. Each shard then builds its names and, with
+    `enrich`, its profile columns using a seed derived from `master_seed` and
+    the shard index.
+    """
+    df_initial = pd.read_csv(initial_csv, dtype={"Employee ID": str})
+    new_count = total - len(df_initial)
+    if new_count < 0:
+        raise ValueError(f"{initial_csv} already has {len(df_initial)} employees, more than {total}")
+
+    rng = np.random.default_rng(master_seed)
+    ids = allocate_employee_ids(new_count, used_ids=df_initial["Employee ID"],
+                                prefix=id_prefix, width=id_width, seed=rng)
+    name_engine = NameEngine()
+    name_engine.reserve(df_initial["Employee Name"])
+    name_codes = name_engine.sample_codes(new_count, seed=rng)
+    del name_engine
+
+    with _part_dir(output_csv) as tmp:
+        tasks = []
+        for shard_index, start in enumerate(range(0, max(new_count, 1), shard_size)):
+            stop = min(start + shard_size, new_count)
+            # The hand-written starter rows go in front of the first shard
+            head = df_initial if shard_index == 0 else None
+            tasks.append((shard_index, master_seed, head, ids[start:stop], name_codes[start:stop],
+                          enrich, os.path.join(tmp, f"part-{shard_index:05d}.csv")))
+        _run_shards(_write_shard, tasks, output_csv, workers or os.cpu_count())
+    return output_csv
+
+
+def enrich_sharded(input_csv, output_csv, master_seed=0, workers=None, shard_size=DEFAULT_SHARD_SIZE):
+    """Enrich an existing employee CSV in fixed-size shards across a process pool."""
+    with _part_dir(output_csv) as tmp:
+        tasks = [
+            (shard_index, master_seed, chunk, os.path.join(tmp, f"part-{shard_index:05d}.csv"))
+            for shard_index, chunk in enumerate(pd.read_csv(input_csv, chunksize=shard_size))
+        ]
+        _run_shards(_enrich_shard, tasks, output_csv, workers or os.cpu_count())
+    return output_csv
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate or enrich employee data across all cores.")
+    parser.add_argument("--total", type=int, default=50000, help="employees to generate")
+    parser.add_argument("--output", default="50000_employees.csv")
+    parser.add_argument("--seed", type=int, default=0, help="master seed")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--id-width", type=int, default=6, help="digits after the 2000 prefix")
+    parser.add_argument("--enrich", action="store_true", help="also add the enrichment columns")
+    parser.add_argument("--enrich-only", metavar="INPUT_CSV",
+                        help="enrich an existing employee CSV instead of generating one")
+    args = parser.parse_args()
+
+    if args.enrich_only:
+        enrich_sharded(args.enrich_only, args.output, args.seed, args.workers, args.shard_size)
+    else:
+        generate_sharded(args.total, args.output, args.seed, args.workers, args.shard_size,
+                         enrich=args.enrich, id_width=args.id_width)
+
+    print(f"✅ File '{args.output}' created.")
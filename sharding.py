@@ -0,0 +1,318 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import threading
+import time
+import zlib
+
+from field_history import FieldHistoryStore
+from interaction_log import InteractionLog
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def shard_of(user_id, n_shards):
+    """Owning shard of an employee; crc32 so it is the same in every process and machine."""
+    return zlib.crc32(str(user_id).strip().encode("utf-8")) % n_shards
+
+
+def shard_dir(base_dir, index):
+    return os.path.join(base_dir, f"shard-{index:03d}")
+
+
+def read_manifest(base_dir):
+    path = os.path.join(base_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"{path} has manifest version {manifest.get('version')}, expected {MANIFEST_VERSION}")
+    return manifest
+
+
+def write_manifest(base_dir, n_shards):
+    os.makedirs(base_dir, exist_ok=True)
+    path = os.path.join(base_dir, MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "n_shards": n_shards}, f)
+    os.replace(tmp_path, path)
+
+
+def _worker_main(conn, directory, data_path, template_bank_path, catalog_path):
+    """
+    One shard: a selector and asker over this shard's own log, checkpoints,
+    models and field history. Requests arrive over `conn` one at a time, so
+    nothing here is shared with other shards or needs locking.
+    """
+    # Ctrl-C reaches the whole process group; shutdown is the router's call
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from employee_dataset import EmployeeDataset
+    from ml_selector import FieldTemplateSelector
+    from question_asker import QuestionAsker
+
+    dataset = EmployeeDataset(data_path)
+    selector = FieldTemplateSelector(
+        dataset,
+        log_store=InteractionLog(os.path.join(directory, "logs")),
+        legacy_logs_path=os.path.join(directory, "logs.json"),
+        checkpoint_dir=os.path.join(directory, "checkpoints"),
+        model_dir=os.path.join(directory, "models"),
+        template_bank_path=template_bank_path,
+        catalog_path=catalog_path,
+        catalog_read_only=True,
+        seed_log_count=0,
+    )
+    if selector.log_count:
+        selector.train_supervised_in_background()
+    asker = QuestionAsker(selector, dataset, history_path=os.path.join(directory, "question_history.db"),
+                          legacy_history_path=None)
+    conn.send(("ready", None))
+
+    handlers = {
+        "ask": asker.ask_questions,
+        "record": asker.record_user_answer,
+        "evict": asker.evict_expired,
+        "metrics": lambda: {"logs": selector.log_count, "model_version": selector.model_version,
+                            "trainer": selector.trainer.metrics(), "session_state": asker.state_metrics()},
+    }
+    try:
+        while True:
+            try:
+                op, args = conn.recv()
+            except EOFError:
+                break
+            if op == "stop":
+                break
+            try:
+                conn.send(("ok", handlers[op](*args)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        selector.trainer.stop()
+        selector.log_store.close()
+        selector.save_checkpoint()
+        selector.save_model_artifact()
+        asker.close()
+        conn.send(("stopped", None))
+
+
+class ShardRouter:
+    """
+    Drop-in for QuestionAsker that partitions employees over `n_shards`
+    worker processes by `shard_of(Employee ID)`.
+
+    Each shard owns its Q-table, log segments, checkpoints, models and field
+    history under `base_dir/shard-NNN/`, so shards never share files or
+    locks. Calls to different shards run in parallel; calls to one shard
+    are serialized by that shard's pipe lock. The layout is recorded in
+    `base_dir/manifest.json`; use `reshard` to change `n_shards`.
+    """
+
+    # Safe to call from several threads at once (see VerificationService)
+    thread_safe = True
+
+    def __init__(self, n_shards, data_path, base_dir="shards", template_bank_path="template_bank.json",
+                 catalog_path="template_catalog.json"):
+        manifest = read_manifest(base_dir)
+        if manifest is None:
+            write_manifest(base_dir, n_shards)
+        elif manifest["n_shards"] != n_shards:
+            raise ValueError(f"{base_dir} holds {manifest['n_shards']} shards; "
+                             f"run `python sharding.py reshard --shards {n_shards}` first")
+        self.n_shards = n_shards
+        self.base_dir = base_dir
+
+        # Assign catalog IDs once here so the workers only ever read the catalog
+        from template_catalog import TemplateCatalog
+        TemplateCatalog.build(template_bank_path, catalog_path)
+
+        context = multiprocessing.get_context("spawn")
+        self._conns = []
+        self._locks = []
+        self._processes = []
+        for index in range(n_shards):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_worker_main, name=f"shard-{index}", daemon=True,
+                args=(child, shard_dir(base_dir, index), data_path, template_bank_path, catalog_path),
+            )
+            process.start()
+            self._conns.append(parent)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+        # Workers start up in parallel; wait for all of them
+        for index, conn in enumerate(self._conns):
+            status, _ = conn.recv()
+            if status != "ready":
+                raise RuntimeError(f"Shard {index} failed to start")
+
+    def _call(self, index, op, *args):
+        with self._locks[index]:
+            self._conns[index].send((op, args))
+            status, result = self._conns[index].recv()
+        if status == "error":
+            raise RuntimeError(f"Shard {index}: {result}")
+        return result
+
+    def shard_for(self, user_id):
+        return shard_of(user_id, self.n_shards)
+
+    def ask_questions(self, user_id, record=None, num_questions=3):
+        # Without a record the shard looks it up in its own copy of the dataset
+        return self._call(self.shard_for(user_id), "ask", user_id, record, num_questions)
+
+    def record_user_answer(self, user_id, field, template, user_answer, correct_answers=None):
+        return self._call(self.shard_for(user_id), "record", user_id, field, template, user_answer,
+                          correct_answers)
+
+    def _broadcast(self, op):
+        """Send `op` to every shard before reading any reply, so it costs one round-trip."""
+        # Locks are taken in index order, so this can't deadlock with _call
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            for conn in self._conns:
+                conn.send((op, ()))
+            replies = [conn.recv() for conn in self._conns]
+        finally:
+            for lock in self._locks:
+                lock.release()
+        for index, (status, result) in enumerate(replies):
+            if status == "error":
+                raise RuntimeError(f"Shard {index}: {result}")
+        return [result for _, result in replies]
+
+    def shard_metrics(self):
+        return self._broadcast("metrics")
+
+    def evict_expired(self):
+        self._broadcast("evict")
+
+    def state_metrics(self, shards=None):
+        """Session-state metrics summed over shards; pass `shards` from `shard_metrics` to reuse them."""
+        totals = {}
+        for shard in shards if shards is not None else self.shard_metrics():
+            for name, counts in shard["session_state"].items():
+                summed = totals.setdefault(name, {})
+                for key, value in counts.items():
+                    summed[key] = summed.get(key, 0) + value
+        return totals
+
+    def close(self):
+        for index, conn in enumerate(self._conns):
+            with self._locks[index]:
+                try:
+                    conn.send(("stop", ()))
+                    conn.recv()
+                except (EOFError, OSError):
+                    pass
+        for process in self._processes:
+            process.join(timeout=30)
+
+
+def _split(log_dirs, history_paths, dest_dir, n_shards, catalog, batch_size=50_000):
+    """
+    Route every log entry and history row from the sources into `n_shards`
+    new shards. Older entries with field names and question text are
+    translated to `catalog` IDs here, so workers never assign IDs.
+    """
+    logs = [InteractionLog(os.path.join(shard_dir(dest_dir, i), "logs"), durability="none")
+            for i in range(n_shards)]
+    pending = [[] for _ in range(n_shards)]
+    moved = 0
+    # Sources are read one after another; a user's entries all come from one
+    # source, so per-user order is preserved
+    for log_dir in log_dirs:
+        for entry in InteractionLog(log_dir):
+            entry = catalog.compact_log(entry)
+            index = shard_of(entry["user_id"], n_shards)
+            pending[index].append(entry)
+            if len(pending[index]) >= batch_size:
+                logs[index].extend(pending[index])
+                pending[index] = []
+            moved += 1
+    for log, entries in zip(logs, pending):
+        log.extend(entries)
+        log.close()
+
+    histories = [FieldHistoryStore(os.path.join(shard_dir(dest_dir, i), "question_history.db"),
+                                   batch_size=batch_size, legacy_json=None)
+                 for i in range(n_shards)]
+    users = 0
+    for path in history_paths:
+        source = FieldHistoryStore(path, legacy_json=None)
+        for user_id, fields in source.items():
+            histories[shard_of(user_id, n_shards)].set(user_id, fields)
+            users += 1
+        source.close()
+    for history in histories:
+        history.close()
+    return moved, users
+
+
+def reshard(n_shards, base_dir="shards", legacy_logs="logs", legacy_history="question_history.db",
+            template_bank_path="template_bank.json", catalog_path="template_catalog.json"):
+    """
+    Rebuild `base_dir` with `n_shards` shards. With an existing sharded
+    layout its shards are redistributed; otherwise the single-process log
+    directory and field history are split. RL checkpoints and model
+    artifacts are not carried over: each shard replays its log on the next
+    start and retrains. Workers must be stopped while this runs.
+    """
+    manifest = read_manifest(base_dir)
+    if manifest is not None:
+        old = [shard_dir(base_dir, i) for i in range(manifest["n_shards"])]
+        log_dirs = [os.path.join(d, "logs") for d in old]
+        history_paths = [os.path.join(d, "question_history.db") for d in old]
+    else:
+        log_dirs = [legacy_logs] if os.path.isdir(legacy_logs) else []
+        history_paths = [legacy_history] if os.path.exists(legacy_history) else []
+
+    from template_catalog import TemplateCatalog
+    catalog = TemplateCatalog.build(template_bank_path, catalog_path)
+
+    # Build next to the old layout and swap it in only once complete
+    new_dir = base_dir.rstrip("/") + ".resharding"
+    shutil.rmtree(new_dir, ignore_errors=True)
+    moved, users = _split(log_dirs, [p for p in history_paths if os.path.exists(p)], new_dir, n_shards, catalog)
+    if catalog.changed:
+        catalog.save(catalog_path)
+    write_manifest(new_dir, n_shards)
+    if os.path.exists(base_dir):
+        os.replace(base_dir, f"{base_dir.rstrip('/')}.old-{int(time.time())}")
+    os.replace(new_dir, base_dir)
+    return moved, users
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the user-sharded selector state.")
+    parser.add_argument("command", choices=["reshard", "status"])
+    parser.add_argument("--shards", type=int, help="new shard count for `reshard`")
+    parser.add_argument("--dir", default="shards")
+    parser.add_argument("--logs", default="logs", help="unsharded log directory to split on first reshard")
+    parser.add_argument("--history", default="question_history.db", help="unsharded field history to split")
+    parser.add_argument("--bank", default="template_bank.json")
+    parser.add_argument("--catalog", default="template_catalog.json")
+    args = parser.parse_args()
+
+    if args.command == "reshard":
+        if not args.shards or args.shards < 1:
+            parser.error("reshard needs --shards N (N >= 1)")
+        start = time.perf_counter()
+        moved, users = reshard(args.shards, args.dir, args.logs, args.history, args.bank, args.catalog)
+        print(f"✅ Resharded into {args.shards} shards: {moved} log entries, {users} users' field history "
+              f"in {time.perf_counter() - start:.1f}s (previous layout kept as {args.dir}.old-*)")
+    else:
+        manifest = read_manifest(args.dir)
+        if manifest is None:
+            print(f"{args.dir} is not sharded yet")
+        else:
+            for index in range(manifest["n_shards"]):
+                entries = sum(1 for _ in InteractionLog(os.path.join(shard_dir(args.dir, index), "logs")))
+                print(f"shard-{index:03d}: {entries} log entries")
@@ -0,0 +1,166 @@
+import json
+import os
+
+CATALOG_VERSION = 1
+PLACEHOLDER = "{value}"
+
+
+class TemplateCatalog:
+    """
+    Compiled form of template_bank.json with stable integer IDs.
+
+    Field and template IDs are assigned in bank order the first time they are
+    seen and persisted in the catalog file, so editing the bank only ever
+    appends IDs. Templates that disappear from the bank are kept (inactive)
+    so old logs still resolve. The selectors, Q-table and logs work with IDs;
+    text is only produced by `render` at display time.
+    """
+
+    def __init__(self):
+        self.fields = []          # field_id -> field name
+        self.templates = []       # template_id -> (field_id, text)
+        self.active = []          # template_id -> still in the bank?
+        self._field_ids = {}
+        self._template_ids = {}   # (field_id, text) -> template_id
+        self._by_field = {}       # field_id -> [active template_ids]
+        self._compiled = []       # template_id -> text split around the placeholder
+        self.changed = False
+
+    @classmethod
+    def build(cls, bank_path="template_bank.json", catalog_path="template_catalog.json", read_only=False):
+        """
+        Load the persisted catalog (if any) and fold in the current bank.
+        With `read_only` new IDs are not saved, e.g. in a process that
+        shares the catalog file with others.
+        """
+        catalog = cls()
+        if catalog_path and os.path.exists(catalog_path):
+            try:
+                catalog._load(catalog_path)
+            except Exception as e:
+                print(f"Warning: Could not load template catalog from {catalog_path}: {e}")
+                catalog = cls()
+
+        try:
+            with open(bank_path) as f:
+                bank = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load template bank from {bank_path}: {e}")
+            bank = {}
+        catalog.sync_bank(bank)
+
+        if catalog.changed and catalog_path and not read_only:
+            catalog.save(catalog_path)
+        return catalog
+
+    def _load(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != CATALOG_VERSION:
+            raise ValueError(f"unsupported catalog version {data.get('version')}")
+        for field in data["fields"]:
+            self._add_field(field)
+        for entry in data["templates"]:
+            self._add_template(entry["field_id"], entry["text"], entry["active"])
+        self.changed = False
+
+    def save(self, path):
+        data = {
+            "version": CATALOG_VERSION,
+            "fields": self.fields,
+            "templates": [
+                {"field_id": fid, "text": text, "active": active}
+                for (fid, text), active in zip(self.templates, self.active)
+            ],
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.changed = False
+
+    def _add_field(self, field):
+        field_id = len(self.fields)
+        self.fields.append(field)
+        self._field_ids[field] = field_id
+        self._by_field[field_id] = []
+        self.changed = True
+        return field_id
+
+    def _add_template(self, field_id, text, active=True):
+        template_id = len(self.templates)
+        self.templates.append((field_id, text))
+        self.active.append(active)
+        self._template_ids[(field_id, text)] = template_id
+        self._compiled.append(tuple(text.split(PLACEHOLDER)))
+        if active:
+            self._by_field[field_id].append(template_id)
+        self.changed = True
+        return template_id
+
+    def sync_bank(self, bank):
+        """Assign IDs to new fields/templates and (de)activate to match `bank`."""
+        in_bank = set()
+        for field, texts in bank.items():
+            field_id = self.field_id(field, create=True)
+            for text in texts:
+                in_bank.add(self.template_id(field_id, text, create=True))
+
+        for template_id, was_active in enumerate(self.active):
+            now_active = template_id in in_bank
+            if now_active != was_active:
+                self.active[template_id] = now_active
+                self.changed = True
+        self._by_field = {field_id: [] for field_id in range(len(self.fields))}
+        for template_id, (field_id, _) in enumerate(self.templates):
+            if self.active[template_id]:
+                self._by_field[field_id].append(template_id)
+
+    def field_id(self, field, create=False):
+        field_id = self._field_ids.get(field)
+        if field_id is None and create:
+            field_id = self._add_field(field)
+        return field_id
+
+    def field_name(self, field_id):
+        return self.fields[field_id]
+
+    def template_id(self, field, text, create=False):
+        """ID of `text` under `field` (a name or field_id)."""
+        field_id = field if isinstance(field, int) else self.field_id(field, create)
+        if field_id is None:
+            return None
+        template_id = self._template_ids.get((field_id, text))
+        if template_id is None and create:
+            # Seen in logs but not in the bank: keep it resolvable, never ask it
+            template_id = self._add_template(field_id, text, active=False)
+        return template_id
+
+    def template_text(self, template_id):
+        return self.templates[template_id][1]
+
+    def templates_for(self, field):
+        """Active template IDs for `field` (a name or field_id)."""
+        field_id = field if isinstance(field, int) else self._field_ids.get(field)
+        return self._by_field.get(field_id, [])
+
+    def render(self, template_id, value=""):
+        """Question text with the placeholder filled in."""
+        parts = self._compiled[template_id]
+        return parts[0] if len(parts) == 1 else str(value).join(parts)
+
+    def compact_log(self, entry):
+        """
+        Convert a log entry to the compact ID form. Entries from older logs
+        that carry the field name and question text are translated.
+        """
+        if "template_id" in entry:
+            return entry
+        field_id = self.field_id(entry["field"], create=True)
+        return {
+            "user_id": entry["user_id"],
+            "field_id": field_id,
+            "template_id": self.template_id(field_id, entry["template"], create=True),
+            "user_answer": entry.get("user_answer", ""),
+            "success": int(bool(entry["success"])),
+        }
@@ -1,13 +1,19 @@
-import os
+import argparse
+import asyncio
+import hashlib
 import json
-from openai import AzureOpenAI
+import os
+import random
+import re
+from types import SimpleNamespace
 
-# Initialize Azure OpenAI client
-client = AzureOpenAI(
-    api_key="d4f12df80419fff9",
-    azure_endpoint="https://mavericks-secureapi.azurewebsites.net/api/azureai",
-    api_version="2024-02-01"
-)
+MODEL = "gpt-4o"
+TEMPERATURE = 0.6
+MAX_TOKENS = 700
+VARIATIONS = 10
+SYSTEM_PROMPT = "You are a helpful assistant that writes HR-friendly questions for employee data collection."
+# A leading bullet or list number such as "-", "•", "3." or "3)"
+_LIST_MARKER = re.compile(r"^\s*(?:[-•*]|\d+[.)])\s*")
 
 # Predefined fields with a sample reference block for each (few-shot prompting style)
 field_prompts = {
@@ -120,32 +126,203 @@ field_prompts = {
 - Which role are you currently working in?"""
 }
 
-# Output dictionary
-output_data = {}
 
-# Generate questions for each field
-for field, prompt in field_prompts.items():
+def make_client(base_url=None, stub=False):
+    """
+    Async chat client. `stub` answers locally without any network; `base_url`
+    points at an OpenAI-compatible endpoint (e.g. a local stub server);
+    otherwise the Azure deployment named by AZURE_OPENAI_ENDPOINT and
+    AZURE_OPENAI_API_KEY is used.
+    """
+    if stub:
+        return StubClient()
+    missing = [name for name in ("AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT") if not os.environ.get(name)]
+    if missing and not base_url:
+        raise RuntimeError(f"Set {' and '.join(missing)} to use the Azure deployment, "
+                           "or pass --base-url or --stub")
+    # Imported here so --stub runs work without the SDK installed
+    from openai import AsyncAzureOpenAI, AsyncOpenAI
+
+    # Retries are handled by generate_field so they share one backoff policy
+    if base_url:
+        return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY", "stub"), base_url=base_url, max_retries=0)
+    return AsyncAzureOpenAI(
+        api_key=os.environ["AZURE_OPENAI_API_KEY"],
+        azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+        api_version="2024-02-01",
+        max_retries=0,
+    )
+
+
+class StubClient:
+    """Offline stand-in for the chat API: echoes the example questions in the prompt."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, temperature, max_tokens):
+        self.calls += 1
+        await asyncio.sleep(0)
+        examples = [line[2:] for line in messages[-1]["content"].splitlines() if line.startswith("- ")]
+        content = "\n".join(f"{i}. {q}" for i, q in enumerate(examples, 1))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class ResponseCache:
+    """One JSON file per request, keyed by a hash of everything that shapes the answer."""
+
+    def __init__(self, directory=".template_cache"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(prompt, model, temperature, max_tokens=MAX_TOKENS):
+        payload = json.dumps([SYSTEM_PROMPT, prompt, model, temperature, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)["content"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, content):
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"content": content}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+
+
+def parse_questions(text, limit=VARIATIONS):
+    """Split a numbered or bulleted list into questions, dropping only the list markers."""
+    questions = [_LIST_MARKER.sub("", line).strip() for line in text.strip().split("\n")]
+    return [q for q in questions if q][:limit]
+
+
+def _question_key(question):
+    # "Share your work contact number" and "share your work contact number." are one question
+    return " ".join(question.casefold().split()).rstrip(".?!:; ")
+
+
+async def generate_field(client, field, prompt, cache, semaphore, model=MODEL, temperature=TEMPERATURE,
+                         retries=4, backoff=1.0):
+    """Questions for one field; cached responses are reused without a request."""
+    key = cache.key(prompt, model, temperature)
+    content = cache.get(key)
+    if content is not None:
+        return parse_questions(content), True
+
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=temperature,
+                    max_tokens=MAX_TOKENS
+                )
+            content = response.choices[0].message.content
+            break
+        except Exception as e:
+            if attempt == retries:
+                raise
+            # Exponential backoff with jitter so parallel retries don't stampede
+            delay = backoff * 2 ** attempt * (0.5 + random.random())
+            print(f"Retrying {field} in {delay:.1f}s ({e})")
+            await asyncio.sleep(delay)
+
+    cache.put(key, content)
+    return parse_questions(content), False
+
+
+async def generate_bank(prompts, client, cache, concurrency=8, **kwargs):
+    """
+    Generate every field in `prompts` concurrently, at most `concurrency`
+    requests in flight. Returns ({field: questions}, stats).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    fields = list(prompts)
+    results = await asyncio.gather(
+        *(generate_field(client, f, prompts[f], cache, semaphore, **kwargs) for f in fields),
+        return_exceptions=True,
+    )
+
+    generated = {}
+    stats = {"requested": 0, "cached": 0, "failed": 0}
+    for field, result in zip(fields, results):
+        if isinstance(result, Exception):
+            print(f"Error processing {field}: {result}")
+            stats["failed"] += 1
+            continue
+        questions, cached = result
+        generated[field] = questions
+        stats["cached" if cached else "requested"] += 1
+    return generated, stats
+
+
+def merge_into_bank(generated, bank_path="template_bank.json"):
+    """
+    Add new questions to the bank, keeping existing ones (and their order) so
+    template catalog IDs stay stable. Returns the number of questions added.
+    """
+    try:
+        with open(bank_path, encoding="utf-8") as f:
+            bank = json.load(f)
+    except FileNotFoundError:
+        bank = {}
+
+    added = 0
+    for field, questions in generated.items():
+        existing = bank.setdefault(field, [])
+        seen = {_question_key(q) for q in existing}
+        for q in questions:
+            key = _question_key(q)
+            if key not in seen:
+                existing.append(q)
+                seen.add(key)
+                added += 1
+
+    tmp_path = bank_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(bank, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, bank_path)
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate question templates and merge them into the bank.")
+    parser.add_argument("--bank", default="template_bank.json")
+    parser.add_argument("--prompts", default=None, help="JSON file of {field: prompt} (default: built-in fields)")
+    parser.add_argument("--cache-dir", default=".template_cache")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--temperature", type=float, default=TEMPERATURE)
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint, e.g. a local stub")
+    parser.add_argument("--stub", action="store_true", help="answer offline without any endpoint")
+    args = parser.parse_args()
+
+    prompts = field_prompts
+    if args.prompts:
+        with open(args.prompts, encoding="utf-8") as f:
+            prompts = json.load(f)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that writes HR-friendly questions for employee data collection."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.6,
-            max_tokens=700
-        )
-
-        # Extract and clean the response into a list
-        questions_text = response.choices[0].message.content.strip()
-        questions = [q.strip("-•1234567890. ").strip() for q in questions_text.split("\n") if q.strip()]
-        output_data[field] = questions[:10]  # Ensure only 10
-
-    except Exception as e:
-        print(f"Error processing {field}: {str(e)}")
-
-# Save to JSON
-with open("templates_bank.json", "w", encoding="utf-8") as f:
-    json.dump(output_data, f, indent=2, ensure_ascii=False)
-
-print("✅ JSON file 'templates_bank.json' created successfully.")
+        client = make_client(args.base_url, args.stub)
+    except RuntimeError as e:
+        parser.error(str(e))
+    generated, stats = asyncio.run(generate_bank(
+        prompts, client, ResponseCache(args.cache_dir), concurrency=args.concurrency,
+        model=args.model, temperature=args.temperature, retries=args.retries,
+    ))
+    added = merge_into_bank(generated, args.bank)
+    print(f"✅ {len(generated)} fields ({stats['requested']} requested, {stats['cached']} cached, "
+          f"{stats['failed']} failed); {added} new questions merged into {args.bank}")
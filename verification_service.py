@@ -0,0 +1,300 @@
+import time
+_started = time.perf_counter()
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from employee_dataset import EmployeeDataset
+from metrics import REGISTRY, SamplingProfiler
+from ml_selector import FieldTemplateSelector
+from question_asker import QuestionAsker
+
+IMPORT_SECONDS = time.perf_counter() - _started
+
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error"}
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Session:
+    __slots__ = ("session_id", "user_id", "record", "questions", "answers", "created")
+
+    def __init__(self, session_id, user_id, record):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.record = record
+        self.questions = None  # [(field, template_id, question_text)]
+        self.answers = {}      # question index -> correct?
+        self.created = time.monotonic()
+
+    def decision(self):
+        if self.questions is None or len(self.answers) < len(self.questions):
+            return None
+        return "granted" if all(self.answers.values()) else "denied"
+
+
+class VerificationService:
+    """
+    Gate verification for many concurrent sessions sharing one
+    FieldTemplateSelector / QuestionAsker.
+
+    Asker calls (model predictions, log fsyncs, SQLite commits) run off the
+    event loop on a single worker thread, so the shared Q-table, logs and
+    field history are only ever touched by that one thread while the loop
+    keeps serving other sessions. A lock per employee keeps each user's
+    ask/answer steps in order when several kiosks hit the same ID at once.
+
+    With a thread-safe asker (the `ShardRouter`, which has no local selector)
+    calls go to the default thread pool instead, so requests for different
+    shards proceed in parallel.
+    """
+
+    def __init__(self, selector, asker, dataset, num_questions=3, session_ttl=900, state_sweep_interval=60):
+        self.selector = selector
+        self.asker = asker
+        self.dataset = dataset
+        self.num_questions = num_questions
+        self.session_ttl = session_ttl
+        # Idle per-user state in the asker is swept at most this often (seconds)
+        self.state_sweep_interval = state_sweep_interval
+        self._last_state_sweep = time.monotonic()
+        self.sessions = {}
+        self._user_locks = defaultdict(asyncio.Lock)
+        self._executor = None if getattr(asker, "thread_safe", False) else ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="asker")
+        self.started = time.monotonic()
+        self.completed = 0
+        self.expired = 0
+        REGISTRY.gauge("active_sessions", lambda: len(self.sessions))
+
+    async def _expire_sessions(self):
+        now = time.monotonic()
+        cutoff = now - self.session_ttl
+        for session_id in [s.session_id for s in self.sessions.values() if s.created < cutoff]:
+            del self.sessions[session_id]
+            self.expired += 1
+        # Drop idle per-user locks so they don't accumulate for every employee ever seen
+        active = {s.user_id for s in self.sessions.values()}
+        for user_id in [u for u, lock in self._user_locks.items() if u not in active and not lock.locked()]:
+            del self._user_locks[user_id]
+        # TTL eviction otherwise only happens when state is written
+        if now - self._last_state_sweep >= self.state_sweep_interval:
+            self._last_state_sweep = now
+            await self._asker_call(self.asker.evict_expired)
+
+    async def _asker_call(self, fn, *args, **kwargs):
+        if self._executor is None:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def close(self):
+        """Wait for in-flight asker calls; call before shutting the selector and asker down."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ServiceError(404, f"Unknown session {session_id}")
+        return session
+
+    async def start_session(self, employee_id):
+        await self._expire_sessions()
+        record = self.dataset.get(str(employee_id).strip())
+        if not record:
+            raise ServiceError(404, "Employee ID not found")
+        session = Session(uuid.uuid4().hex, str(record["Employee ID"]), record)
+        self.sessions[session.session_id] = session
+        return {"session_id": session.session_id, "name": record.get("Employee Name", "User")}
+
+    async def get_questions(self, session_id):
+        session = self._session(session_id)
+        async with self._user_locks[session.user_id]:
+            if session.questions is None:
+                session.questions = await self._asker_call(self.asker.ask_questions, session.user_id,
+                                                           session.record, num_questions=self.num_questions)
+        # The field lets a kiosk pick a fitting input (e.g. a date picker)
+        return {"questions": [{"question_id": i, "field": q[0], "question": q[2]}
+                              for i, q in enumerate(session.questions)]}
+
+    async def submit_answer(self, session_id, question_id, answer):
+        session = self._session(session_id)
+        async with self._user_locks[session.user_id]:
+            if session.questions is None:
+                raise ServiceError(409, "Questions have not been requested for this session")
+            if not isinstance(question_id, int) or not 0 <= question_id < len(session.questions):
+                raise ServiceError(400, f"Unknown question_id {question_id!r}")
+            if question_id in session.answers:
+                raise ServiceError(409, f"Question {question_id} was already answered")
+
+            field, template, _ = session.questions[question_id]
+            answer = str(answer).strip()
+            session.answers[question_id] = bool(await self._asker_call(
+                self.asker.record_user_answer, session.user_id, field, template, answer))
+
+            decision = session.decision()
+            if decision is not None:
+                self.completed += 1
+                # A concurrent _expire_sessions may have dropped it meanwhile
+                self.sessions.pop(session_id, None)
+        return {"correct": session.answers[question_id], "decision": decision}
+
+    async def health(self):
+        health = {
+            "status": "ok",
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "active_sessions": len(self.sessions),
+            "completed_sessions": self.completed,
+            "expired_sessions": self.expired,
+        }
+        if self.selector is not None:
+            health["session_state"] = await self._asker_call(self.asker.state_metrics)
+            health["logs"] = self.selector.log_count
+            health["model_version"] = self.selector.model_version
+            health["trainer"] = self.selector.trainer.metrics()
+        else:
+            # One metrics round-trip to the shards, off the event loop
+            shards = await self._asker_call(self.asker.shard_metrics)
+            health["session_state"] = self.asker.state_metrics(shards)
+            health["logs"] = sum(s["logs"] for s in shards)
+            health["shards"] = [{"logs": s["logs"], "model_version": s["model_version"], "trainer": s["trainer"]}
+                                for s in shards]
+        return health
+
+    async def dispatch(self, method, path, body):
+        parts = [p for p in path.split("?")[0].split("/") if p]
+        if parts == ["health"] and method == "GET":
+            return 200, await self.health()
+        if parts == ["metrics"] and method == "GET":
+            return 200, REGISTRY.render()
+        if parts == ["sessions"] and method == "POST":
+            return 201, await self.start_session(body.get("employee_id", ""))
+        if len(parts) == 3 and parts[0] == "sessions":
+            if parts[2] == "questions" and method == "GET":
+                return 200, await self.get_questions(parts[1])
+            if parts[2] == "answers" and method == "POST":
+                return 200, await self.submit_answer(parts[1], body.get("question_id"), body.get("answer", ""))
+            raise ServiceError(405, f"{method} not allowed on {path}")
+        raise ServiceError(404, f"No route for {method} {path}")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                raw = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+
+                try:
+                    body = json.loads(raw) if raw else {}
+                    if not isinstance(body, dict):
+                        raise ServiceError(400, "Request body must be a JSON object")
+                    status, payload = await self.dispatch(method, path, body)
+                except json.JSONDecodeError:
+                    status, payload = 400, {"error": "Request body is not valid JSON"}
+                except ServiceError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    print(f"Warning: Request {method} {path} failed: {e}")
+                    status, payload = 500, {"error": "Internal error"}
+
+                if isinstance(payload, str):
+                    data, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write_metrics(self, path, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                REGISTRY.write(path)
+            except OSError as e:
+                print(f"Warning: Could not write metrics to {path}: {e}")
+
+    async def serve(self, host="127.0.0.1", port=8080, metrics_file=None, metrics_interval=15.0):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"✅ Verification service listening on http://{host}:{port} (metrics at /metrics)")
+        if metrics_file:
+            asyncio.ensure_future(self._write_metrics(metrics_file, metrics_interval))
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve gate verification over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data", default="employee_store.bin" if os.path.exists("employee_store.bin")
+                        else "enriched_employee_dataset_50000.json")
+    parser.add_argument("--metrics-file", default=None, help="also write Prometheus metrics here periodically")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="partition users over N worker processes (see sharding.py)")
+    parser.add_argument("--shard-dir", default="shards")
+    parser.add_argument("--profile", default=None, help="run the sampling profiler, dump folded stacks here on exit")
+    args = parser.parse_args()
+
+    profiler = SamplingProfiler().start() if args.profile else None
+
+    startup_began = time.perf_counter()
+    dataset = EmployeeDataset(args.data)
+    if args.shards:
+        from sharding import ShardRouter
+        selector, asker = None, ShardRouter(args.shards, args.data, base_dir=args.shard_dir)
+    else:
+        selector = FieldTemplateSelector(dataset)
+        if selector.log_count:
+            selector.train_supervised_in_background()
+        asker = QuestionAsker(selector, dataset)
+    service = VerificationService(selector, asker, dataset)
+    startup_seconds = time.perf_counter() - startup_began
+    REGISTRY.observe("startup_imports", IMPORT_SECONDS)
+    REGISTRY.observe("startup", startup_seconds)
+    print(f"Imports took {IMPORT_SECONDS:.2f}s, startup {startup_seconds:.2f}s")
+    try:
+        asyncio.run(service.serve(args.host, args.port, metrics_file=args.metrics_file))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        if selector is not None:
+            selector.trainer.stop()
+            selector.log_store.close()
+            selector.save_checkpoint()
+            selector.save_model_artifact()
+        asker.close()
+        if profiler is not None:
+            profiler.stop()
+            profiler.dump(args.profile)